@@ -2,11 +2,12 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+import msgspec
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.body import decode_body
 from app.config import settings
 from app.database import get_db
 from app.services.agent import run_agent_stream
@@ -14,18 +15,18 @@ from app.services.agent import run_agent_stream
 router = APIRouter()
 
 
-class ChatMessage(BaseModel):
+class ChatMessage(msgspec.Struct, frozen=True):
     role: str  # "user" or "assistant"
     content: str
 
 
-class ChatRequest(BaseModel):
+class ChatRequest(msgspec.Struct, frozen=True):
     messages: list[ChatMessage]
 
 
-@router.post("/api/chat")
+@router.post("/api/chat", response_model=None)
 async def chat(
-    request: ChatRequest,
+    raw: Request,
     db: AsyncSession = Depends(get_db),
 ):
     """Stream a chat response from the AI valuation agent.
@@ -46,6 +47,7 @@ async def chat(
             detail="AI agent not configured. Set ANTHROPIC_API_KEY in .env",
         )
 
+    request = await decode_body(raw, ChatRequest)
     api_messages = [{"role": m.role, "content": m.content} for m in request.messages]
 
     return StreamingResponse(
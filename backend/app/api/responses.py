@@ -0,0 +1,25 @@
+"""Shared response classes for the API."""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types orjson does not serialize natively (NUMERIC columns)."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class JSONResponse(ORJSONResponse):
+    """orjson-backed response that also accepts Decimal values from raw SQL rows."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC,
+        )
@@ -1,43 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import text
+from functools import lru_cache
+
+import msgspec
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import TextClause, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.api.body import decode_body
+from app.database import get_db, get_read_db
 from app.schemas.transaction import TransactionCreate, TransactionUpdate
 
 router = APIRouter()
 
+# Static statements are built once so SQLAlchemy's compiled cache always hits
+_INSERT_TX = text("""
+    INSERT INTO omi.transactions
+        (transaction_date, transaction_type, declared_price, municipality,
+         omi_zone, link_zona, cadastral_category, cadastral_vani,
+         cadastral_mq, cadastral_mc, notes)
+    VALUES
+        (:transaction_date, :transaction_type, :declared_price, :municipality,
+         :omi_zone, :link_zona, :cadastral_category, :cadastral_vani,
+         :cadastral_mq, :cadastral_mc, :notes)
+    RETURNING id, created_at
+""")
+
+_DELETE_TX = text("DELETE FROM omi.transactions WHERE id = :id RETURNING id")
+
+
+@lru_cache(maxsize=128)
+def _update_tx(cols: tuple[str, ...]) -> TextClause:
+    """Return the UPDATE statement for a sorted tuple of columns, built once per set."""
+    set_clause = ", ".join(f"{c} = :{c}" for c in cols)
+    return text(f"UPDATE omi.transactions SET {set_clause} WHERE id = :id RETURNING id")
+
 
 @router.post("/api/transactions")
 async def create_transaction(
-    data: TransactionCreate,
+    raw: Request,
     db: AsyncSession = Depends(get_db),
 ):
     """Create a manually entered transaction record."""
-    result = await db.execute(
-        text("""
-            INSERT INTO omi.transactions
-                (transaction_date, transaction_type, declared_price, municipality,
-                 omi_zone, link_zona, cadastral_category, cadastral_vani,
-                 cadastral_mq, cadastral_mc, notes)
-            VALUES
-                (:transaction_date, :transaction_type, :declared_price, :municipality,
-                 :omi_zone, :link_zona, :cadastral_category, :cadastral_vani,
-                 :cadastral_mq, :cadastral_mc, :notes)
-            RETURNING id, created_at
-        """),
-        data.model_dump(),
-    )
+    data = await decode_body(raw, TransactionCreate)
+    payload = msgspec.structs.asdict(data)
+    result = await db.execute(_INSERT_TX, payload)
     row = result.first()
     await db.commit()
-    return {"id": row.id, "created_at": str(row.created_at), **data.model_dump()}
+    return {"id": row.id, "created_at": str(row.created_at), **payload}
 
 
 @router.get("/api/transactions")
 async def list_transactions(
     link_zona: str | None = Query(None),
     municipality: str | None = Query(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """List transactions, optionally filtered by zone or municipality."""
     conditions = []
@@ -52,18 +67,23 @@ async def list_transactions(
 
     where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
+    # Let Postgres emit the JSON array directly instead of building row dicts
     result = await db.execute(
         text(f"""
-            SELECT id, transaction_date, transaction_type, declared_price,
-                   municipality, omi_zone, link_zona, cadastral_category,
-                   cadastral_vani, cadastral_mq, cadastral_mc, notes, created_at
-            FROM omi.transactions
-            {where}
-            ORDER BY transaction_date DESC NULLS LAST
+            SELECT COALESCE(
+                json_agg(t ORDER BY t.transaction_date DESC NULLS LAST), '[]'::json
+            )::text
+            FROM (
+                SELECT id, transaction_date, transaction_type, declared_price,
+                       municipality, omi_zone, link_zona, cadastral_category,
+                       cadastral_vani, cadastral_mq, cadastral_mc, notes, created_at
+                FROM omi.transactions
+                {where}
+            ) t
         """),
         params,
     )
-    return [dict(row._mapping) for row in result.all()]
+    return Response(content=result.scalar(), media_type="application/json")
 
 
 @router.put("/api/transactions/{transaction_id}")
@@ -73,18 +93,15 @@ async def update_transaction(
     db: AsyncSession = Depends(get_db),
 ):
     """Update a transaction record."""
-    # Build SET clause from non-None fields
-    updates = {k: v for k, v in data.model_dump().items() if v is not None}
+    # Build SET clause from only the fields the client sent; an explicit null clears the column
+    updates = {k: getattr(data, k) for k in data.model_fields_set}
     if not updates:
         raise HTTPException(400, "No fields to update")
 
-    set_clause = ", ".join(f"{k} = :{k}" for k in updates)
+    stmt = _update_tx(tuple(sorted(updates)))
     updates["id"] = transaction_id
 
-    result = await db.execute(
-        text(f"UPDATE omi.transactions SET {set_clause} WHERE id = :id RETURNING id"),
-        updates,
-    )
+    result = await db.execute(stmt, updates)
     if not result.first():
         raise HTTPException(404, "Transaction not found")
     await db.commit()
@@ -97,10 +114,7 @@ async def delete_transaction(
     db: AsyncSession = Depends(get_db),
 ):
     """Delete a transaction record."""
-    result = await db.execute(
-        text("DELETE FROM omi.transactions WHERE id = :id RETURNING id"),
-        {"id": transaction_id},
-    )
+    result = await db.execute(_DELETE_TX, {"id": transaction_id})
     if not result.first():
         raise HTTPException(404, "Transaction not found")
     await db.commit()
@@ -1,13 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import hashlib
+
+import msgspec
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.body import decode_body
+from app.api.responses import JSONResponse
 from app.database import get_db
 from app.schemas.enhanced_valuation import EnhancedValuationRequest
-from app.services.coefficients import get_coefficient_options
+from app.services.coefficients import COEFFICIENT_OPTIONS_JSON
 from app.services.valuation import enhanced_valuate_address, valuate_address
 
 router = APIRouter()
 
+# The coefficient listing is encoded once at import; its hash doubles as the ETag
+_COEFFICIENTS_ETAG = f'"{hashlib.blake2b(COEFFICIENT_OPTIONS_JSON, digest_size=8).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header (weak tags, a list, or *) matches etag.
+
+    If-None-Match uses weak comparison, so W/"x" matches "x"; proxies that
+    compress the response hand the tag back in that form.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
 
 @router.get("/api/valuate")
 async def valuate(
@@ -20,14 +39,15 @@ async def valuate(
     """Main valuation endpoint. Geocodes an address and returns OMI zone + price data."""
     try:
         result = await valuate_address(address, property_type, surface_m2, semester, db)
-        return result
+        # Returned as a response so FastAPI skips its jsonable_encoder pass over the dict
+        return JSONResponse(result)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.post("/api/valuate/enhanced")
 async def enhanced_valuate(
-    request: EnhancedValuationRequest,
+    raw: Request,
     db: AsyncSession = Depends(get_db),
 ):
     """Enhanced valuation with correction coefficients.
@@ -35,24 +55,28 @@ async def enhanced_valuate(
     Applies property-specific adjustments (floor, renovation, exposure, noise, etc.)
     on top of OMI zone data to produce a more accurate estimate.
     """
+    request = await decode_body(raw, EnhancedValuationRequest)
     try:
         result = await enhanced_valuate_address(
             address=request.address,
             property_type=request.property_type,
             surface_m2=request.surface_m2,
             semester=request.semester,
-            property_details=request.details.model_dump(),
+            property_details=msgspec.structs.asdict(request.details),
             db=db,
         )
-        return result
+        return JSONResponse(result)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.get("/api/coefficients")
-async def list_coefficients():
+async def list_coefficients(if_none_match: str | None = Header(None)):
     """Return all available correction coefficient factors and options.
 
     Used by the frontend wizard to dynamically build the property details form.
     """
-    return {"factors": get_coefficient_options()}
+    headers = {"ETag": _COEFFICIENTS_ETAG}
+    if if_none_match and _etag_matches(if_none_match, _COEFFICIENTS_ETAG):
+        return Response(status_code=304, headers=headers)
+    return Response(content=COEFFICIENT_OPTIONS_JSON, media_type="application/json", headers=headers)
@@ -1,86 +1,136 @@
-import json
+from collections.abc import AsyncGenerator
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import text
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import TextClause, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import async_session, get_read_db
 from app.services.zone_lookup import find_zone, get_latest_semester
 
 router = APIRouter()
 
+_EMPTY_FEATURE_COLLECTION = b'{"type":"FeatureCollection","features":[]}'
+_STREAM_BATCH_SIZE = 500
+# Deeper tiles cover a few metres; no map client asks for more
+_MVT_MAX_ZOOM = 24
+
 
 @router.get("/api/zones/geojson")
 async def zones_geojson(
     bbox: str | None = Query(None, description="Bounding box: min_lng,min_lat,max_lng,max_lat"),
     semester: str | None = Query(None, description="Semester"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Return zone polygons as GeoJSON FeatureCollection for map display."""
+    # Build query with optional bbox filter
+    params = {}
+    bbox_clause = ""
+    if bbox:
+        try:
+            min_lng, min_lat, max_lng, max_lat = map(float, bbox.split(",", 3))
+        except ValueError:
+            raise HTTPException(400, "Invalid bbox: expected min_lng,min_lat,max_lng,max_lat")
+        # A degenerate box cannot contain any polygon area worth drawing
+        if max_lng - min_lng == 0 or max_lat - min_lat == 0:
+            return Response(_EMPTY_FEATURE_COLLECTION, media_type="application/json")
+        params.update(min_lng=min_lng, min_lat=min_lat, max_lng=max_lng, max_lat=max_lat)
+        bbox_clause = """
+            AND z.geom && ST_MakeEnvelope(:min_lng, :min_lat, :max_lng, :max_lat, 4326)
+        """
+
     if not semester:
         semester = await get_latest_semester(db)
         if not semester:
             raise HTTPException(404, "No data available")
+    params["semester"] = semester
+
+    # Postgres renders each Feature as JSON text; rows are streamed through with a
+    # server-side cursor, so memory stays flat however many polygons the bbox holds
+    stmt = text(f"""
+        SELECT json_build_object(
+            'type', 'Feature',
+            'geometry', ST_AsGeoJSON(z.geom)::json,
+            'properties', json_build_object(
+                'link_zona', z.link_zona,
+                'zone_code', z.zone_code,
+                'fascia', z.fascia,
+                'municipality', z.municipality_name,
+                'description', z.zone_description,
+                'price_min', NULLIF(q.price_min, 0)::float8,
+                'price_max', NULLIF(q.price_max, 0)::float8
+            )
+        )::text AS feature
+        FROM omi.zones z
+        LEFT JOIN omi.zone_prevalent_20 q
+               ON q.link_zona = z.link_zona AND q.semester = z.semester
+        WHERE z.semester = :semester
+        {bbox_clause}
+    """)
+
+    return StreamingResponse(_stream_features(stmt, params), media_type="application/json")
+
+
+async def _stream_features(stmt: TextClause, params: dict) -> AsyncGenerator[bytes, None]:
+    """Yield a FeatureCollection, one batch of server-rendered features per chunk.
+
+    Uses its own transactional session: the request's session may already be closed
+    while the body streams, and server-side cursors need an open transaction.
+    """
+    async with async_session() as session:
+        result = await session.stream(stmt, params)
+        yield b'{"type":"FeatureCollection","features":['
+        sep = b""
+        async for rows in result.scalars().partitions(_STREAM_BATCH_SIZE):
+            yield sep + ",".join(rows).encode()
+            sep = b","
+        yield b"]}"
+
+
+@router.get("/api/zones/mvt/{z}/{x}/{y}")
+async def zones_mvt(
+    z: int = Path(ge=0, le=_MVT_MAX_ZOOM),
+    x: int = Path(ge=0),
+    y: int = Path(ge=0),
+    semester: str | None = Query(None, description="Semester"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Return zone polygons for one XYZ tile as a Mapbox Vector Tile (layer "zones")."""
+    # ST_TileEnvelope raises on a tile outside the grid; reject it before querying
+    if x >= 1 << z or y >= 1 << z:
+        raise HTTPException(400, f"Invalid tile: x and y must be below {1 << z} at zoom {z}")
 
-    # Build query with optional bbox filter
-    params = {"semester": semester}
-    bbox_clause = ""
-    if bbox:
-        parts = bbox.split(",")
-        if len(parts) == 4:
-            params["min_lng"] = float(parts[0])
-            params["min_lat"] = float(parts[1])
-            params["max_lng"] = float(parts[2])
-            params["max_lat"] = float(parts[3])
-            bbox_clause = """
-                AND z.geom && ST_MakeEnvelope(:min_lng, :min_lat, :max_lng, :max_lat, 4326)
-            """
+    if not semester:
+        semester = await get_latest_semester(db)
+        if not semester:
+            raise HTTPException(404, "No data available")
 
     result = await db.execute(
-        text(f"""
-            SELECT z.link_zona, z.zone_code, z.fascia, z.municipality_name,
-                   z.zone_description,
-                   ST_AsGeoJSON(z.geom) as geojson,
-                   q.price_min as avg_price_min,
-                   q.price_max as avg_price_max
-            FROM omi.zones z
-            LEFT JOIN LATERAL (
-                SELECT price_min, price_max
-                FROM omi.quotations
-                WHERE link_zona = z.link_zona
-                  AND semester = z.semester
-                  AND property_type_code = 20
-                  AND is_prevalent = true
-                LIMIT 1
-            ) q ON true
-            WHERE z.semester = :semester
-            {bbox_clause}
+        text("""
+            WITH mvtgeom AS (
+                SELECT ST_AsMVTGeom(
+                           ST_Transform(z.geom, 3857), ST_TileEnvelope(:z, :x, :y)
+                       ) AS geom,
+                       z.link_zona, z.zone_code, z.fascia,
+                       z.municipality_name AS municipality,
+                       -- A zero price means "not quoted", as in zones_geojson
+                       NULLIF(q.price_min, 0)::float8 AS price_min,
+                       NULLIF(q.price_max, 0)::float8 AS price_max
+                FROM omi.zones z
+                LEFT JOIN omi.zone_prevalent_20 q
+                       ON q.link_zona = z.link_zona AND q.semester = z.semester
+                WHERE z.semester = :semester
+                  AND z.geom && ST_Transform(ST_TileEnvelope(:z, :x, :y), 4326)
+            )
+            SELECT ST_AsMVT(mvtgeom, 'zones') FROM mvtgeom
         """),
-        params,
+        {"z": z, "x": x, "y": y, "semester": semester},
     )
 
-    features = []
-    for row in result.all():
-        geom = json.loads(row.geojson)
-        feature = {
-            "type": "Feature",
-            "geometry": geom,
-            "properties": {
-                "link_zona": row.link_zona,
-                "zone_code": row.zone_code,
-                "fascia": row.fascia,
-                "municipality": row.municipality_name,
-                "description": row.zone_description,
-                "price_min": float(row.avg_price_min) if row.avg_price_min else None,
-                "price_max": float(row.avg_price_max) if row.avg_price_max else None,
-            },
-        }
-        features.append(feature)
-
-    return {
-        "type": "FeatureCollection",
-        "features": features,
-    }
+    return Response(
+        content=bytes(result.scalar() or b""),
+        media_type="application/vnd.mapbox-vector-tile",
+    )
 
 
 @router.get("/api/zones/by-coordinates")
@@ -88,7 +138,7 @@ async def zone_by_coordinates(
     lat: float = Query(...),
     lng: float = Query(...),
     semester: str | None = Query(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Look up the OMI zone for a specific lat/lng point."""
     if not semester:
@@ -115,7 +165,7 @@ async def zone_by_coordinates(
 async def get_quotations(
     link_zona: str = Query(...),
     semester: str | None = Query(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Get all quotations for a specific zone."""
     if not semester:
@@ -125,13 +175,17 @@ async def get_quotations(
 
     result = await db.execute(
         text("""
-            SELECT property_type_code, property_type_desc, conservation_state,
-                   is_prevalent, price_min, price_max, surface_type_sale,
-                   rent_min, rent_max, surface_type_rent
-            FROM omi.quotations
-            WHERE link_zona = :link_zona AND semester = :semester
-            ORDER BY property_type_code, is_prevalent DESC
+            SELECT COALESCE(
+                json_agg(t ORDER BY t.property_type_code, t.is_prevalent DESC), '[]'::json
+            )::text
+            FROM (
+                SELECT property_type_code, property_type_desc, conservation_state,
+                       is_prevalent, price_min, price_max, surface_type_sale,
+                       rent_min, rent_max, surface_type_rent
+                FROM omi.quotations
+                WHERE link_zona = :link_zona AND semester = :semester
+            ) t
         """),
         {"link_zona": link_zona, "semester": semester},
     )
-    return [dict(row._mapping) for row in result.all()]
+    return Response(content=result.scalar(), media_type="application/json")
@@ -1,3 +1,5 @@
+from functools import cached_property
+
 from pydantic_settings import BaseSettings
 
 
@@ -7,8 +9,15 @@ class Settings(BaseSettings):
     google_geocoding_api_key: str = ""
     cors_origins: str = "http://localhost:5173"
     anthropic_api_key: str = ""
+    # Optional Redis cache in front of the geocode cache table (empty = disabled)
+    redis_url: str = ""
+    # Chat SSE: coalesce streamed text frames up to this many bytes or seconds
+    sse_flush_bytes: int = 4096
+    sse_flush_interval: float = 0.05
+    # Abort a Claude stream that delivers no event for this many seconds
+    agent_stream_idle_timeout: float = 30.0
 
-    @property
+    @cached_property
     def cors_origin_list(self) -> list[str]:
         return [o.strip() for o in self.cors_origins.split(",") if o.strip()]
 
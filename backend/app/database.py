@@ -1,24 +1,56 @@
 from collections.abc import AsyncGenerator
 
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.config import settings
 
-# Convert sync URL to async: postgresql+psycopg -> postgresql+psycopg (psycopg3 supports async natively)
+# Convert sync URL to async: the app uses asyncpg, while the import scripts keep psycopg
 _db_url = settings.database_url
 # Handle various PostgreSQL URL formats (local, Supabase, etc.)
 if _db_url.startswith("postgres://"):
     # Supabase-style short URL
-    _db_url = _db_url.replace("postgres://", "postgresql+psycopg_async://", 1)
-elif "+psycopg://" in _db_url and "+psycopg_async://" not in _db_url:
-    _db_url = _db_url.replace("+psycopg://", "+psycopg_async://")
-elif "postgresql://" in _db_url and "+psycopg" not in _db_url:
-    _db_url = _db_url.replace("postgresql://", "postgresql+psycopg_async://")
+    _db_url = _db_url.replace("postgres://", "postgresql+asyncpg://", 1)
+elif "+psycopg_async://" in _db_url:
+    _db_url = _db_url.replace("+psycopg_async://", "+asyncpg://")
+elif "+psycopg://" in _db_url:
+    _db_url = _db_url.replace("+psycopg://", "+asyncpg://")
+elif "postgresql://" in _db_url:
+    _db_url = _db_url.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(_db_url, echo=False)
+# asyncpg takes "ssl" rather than libpq's "sslmode" (e.g. Supabase ?sslmode=require)
+_url = make_url(_db_url)
+if "sslmode" in _url.query:
+    _url = _url.update_query_dict({"ssl": _url.query["sslmode"]}).difference_update_query(
+        ["sslmode"]
+    )
+
+# asyncpg prepares every statement and caches them per connection (the dialect's
+# default prepared_statement_cache_size). Set ?prepared_statement_cache_size=0 for
+# transaction-mode poolers (e.g. Supabase port 6543), which cannot hold them.
+engine = create_async_engine(
+    _url,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    echo=False,
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Read-only endpoints run in autocommit, skipping the BEGIN/ROLLBACK round-trips
+read_session = async_sessionmaker(
+    engine.execution_options(isolation_level="AUTOCOMMIT"),
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with read_session() as session:
+        yield session
@@ -1,13 +1,30 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.responses import JSONResponse
 from app.api.router import api_router
 from app.config import settings
+from app.services.agent import close_anthropic_client
+from app.services.geocoder import geocoder
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    geocoder.start_cache_writer()
+    yield
+    await geocoder.stop_cache_writer()
+    await geocoder.close()
+    await close_anthropic_client()
+
 
 app = FastAPI(
     title="VendoCasa - Italian Real Estate Valuation",
     description="Personal tool for OMI-based property valuation across Italian cities",
     version="0.1.0",
+    default_response_class=JSONResponse,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -1,9 +1,13 @@
-"""Pydantic schemas for the enhanced valuation endpoint with correction coefficients."""
+"""Schemas for the enhanced valuation endpoint with correction coefficients.
 
+Request bodies are msgspec Structs decoded in the handler; responses stay Pydantic.
+"""
+
+import msgspec
 from pydantic import BaseModel
 
 
-class PropertyDetails(BaseModel):
+class PropertyDetails(msgspec.Struct):
     """User-provided property characteristics for coefficient adjustment."""
     conservation_state: str = "NORMALE"  # "OTTIMO" | "NORMALE" | "SCADENTE"
     renovation: str = "none"
@@ -52,8 +56,8 @@ class AdjustedEstimateResponse(BaseModel):
     benchmark_comparison: BenchmarkComparisonResponse | None = None
 
 
-class EnhancedValuationRequest(BaseModel):
-    """Request body for the enhanced valuation endpoint."""
+class EnhancedValuationRequest(msgspec.Struct, kw_only=True):
+    """Request body for the enhanced valuation endpoint (decoded with msgspec)."""
     address: str
     surface_m2: float
     property_type: int = 20
@@ -1,9 +1,10 @@
 from datetime import date
 
+import msgspec
 from pydantic import BaseModel
 
 
-class TransactionCreate(BaseModel):
+class TransactionCreate(msgspec.Struct):
     transaction_date: date | None = None
     transaction_type: str | None = None
     declared_price: float | None = None
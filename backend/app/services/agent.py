@@ -6,19 +6,25 @@ conversational property valuations backed by OMI data.
 
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
+import re
+import time
 from collections.abc import AsyncGenerator
 
-from anthropic import AsyncAnthropic
-from sqlalchemy.ext.asyncio import AsyncSession
+import orjson
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient, Timeout
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app.config import settings
-from app.services.coefficients import get_coefficient_options
+from app.database import async_session
+from app.services.coefficients import COEFFICIENT_OPTIONS_JSON, get_coefficient_options
+from app.services.geocoder import normalize_address
 from app.services.valuation import (
     enhanced_valuate_address,
     get_comparables,
     get_quotations,
+    simple_estimate,
     valuate_address,
 )
 
@@ -314,20 +320,162 @@ async def execute_tool(
         return {"error": f"Unknown tool: {tool_name}"}
 
 
+async def _execute_tool_in_session(
+    tool_name: str,
+    tool_input: dict,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> dict:
+    """Execute a tool in its own session, so several tools can run concurrently."""
+    async with session_factory() as session:
+        return await execute_tool(tool_name, tool_input, session)
+
+
+# ---------------------------------------------------------------------------
+# Speculative Prefetch
+# ---------------------------------------------------------------------------
+
+# An Italian street address with a house number followed by a city, e.g.
+# "Via Roma 10, Milano". The number keeps prose like "via email, grazie" from
+# starting a geocode (and taking the Nominatim rate-limit slot) nobody asked for
+_ADDRESS_RE = re.compile(
+    r"\b(?:via|viale|corso|piazza)\s+[^,\n]+?\s+(?:n\.?\s*)?\d+[a-z]?(?:/\w+)?\s*,\s*\w+",
+    re.IGNORECASE,
+)
+
+
+def _speculate_address(
+    messages: list[dict],
+    session_factory: async_sessionmaker[AsyncSession],
+) -> tuple[str, asyncio.Task] | None:
+    """Start valuate_property for an address in the last user message.
+
+    The lookup (geocode + zone + quotations + comparables) then overlaps with
+    Claude's first response instead of following it. Returns (normalized address,
+    task), or None when no address is found.
+    """
+    if not messages or messages[-1].get("role") != "user":
+        return None
+    content = messages[-1].get("content")
+    if not isinstance(content, str):
+        return None
+    match = _ADDRESS_RE.search(content)
+    if not match:
+        return None
+
+    address = match.group(0)
+    task = asyncio.create_task(
+        _execute_tool_in_session("valuate_property", {"address": address}, session_factory)
+    )
+    return normalize_address(address), task
+
+
+def _drop_speculation(task: asyncio.Task) -> None:
+    """Cancel a speculative lookup nobody will await, retrieving any error it ended with.
+
+    cancel() is a no-op on a finished task, whose exception would otherwise be
+    logged as never retrieved.
+    """
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+def _matches_speculation(tool_input: dict, address_key: str) -> bool:
+    """Whether a valuate_property call can be answered by the speculative lookup."""
+    return (
+        tool_input.get("property_type", 20) == 20
+        and not tool_input.get("semester")
+        and normalize_address(tool_input.get("address", "")) == address_key
+    )
+
+
+async def _finish_speculation(task: asyncio.Task, tool_input: dict) -> dict:
+    """Await the speculative lookup and adapt it to the actual tool input."""
+    result = await task
+    return {
+        **result,
+        "address": tool_input["address"],
+        "estimate": simple_estimate(result["quotations"], tool_input.get("surface_m2")),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Anthropic Client
+# ---------------------------------------------------------------------------
+
+# One pooled HTTP/2 client per process, so agent requests reuse warm TLS connections
+_client: AsyncAnthropic | None = None
+
+
+def get_anthropic_client() -> AsyncAnthropic:
+    """Return the shared Anthropic client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            timeout=Timeout(60.0, connect=5.0),
+            # The SDK's default transport (keeps its pool limits), with HTTP/2 enabled
+            http_client=DefaultAsyncHttpxClient(http2=True),
+        )
+    return _client
+
+
+async def close_anthropic_client() -> None:
+    """Close the shared Anthropic client (called on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
 # ---------------------------------------------------------------------------
 # Streaming Agent Runner
 # ---------------------------------------------------------------------------
 
 
+_DONE_EVENT = b"event: done\ndata: {}\n\n"
+
+# Request parameters that never change between calls, built once and spread per round
+_STREAM_KWARGS = {
+    "model": "claude-sonnet-4-20250514",
+    "max_tokens": 4096,
+    "system": SYSTEM_PROMPT,
+    "tools": TOOLS,
+}
+
+# Tool results whose JSON encoding is static and computed once
+_STATIC_TOOL_RESULTS = {"get_coefficient_info": COEFFICIENT_OPTIONS_JSON}
+
+
+def _dumps(obj: object) -> bytes:
+    """JSON-serialize to UTF-8 bytes with fallback for Decimal, datetime, etc."""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
 def _serialize(obj: object) -> str:
     """JSON-serialize with fallback for Decimal, datetime, etc."""
-    return json.dumps(obj, default=str, ensure_ascii=False)
+    return _dumps(obj).decode()
+
+
+def _text_delta_frame(text: str) -> bytes:
+    """Encode a text_delta frame; only the string itself goes through orjson."""
+    return b'event: text_delta\ndata: {"text":' + orjson.dumps(text) + b"}\n\n"
+
+
+def _sse(event: str, payload: object) -> bytes:
+    """Format one pre-encoded SSE frame."""
+    return _sse_raw(event, _dumps(payload))
+
+
+def _sse_raw(event: str, data: bytes) -> bytes:
+    """Format one SSE frame around an already JSON-encoded payload."""
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
 
 
 async def run_agent_stream(
     messages: list[dict],
     db: AsyncSession,
-) -> AsyncGenerator[str, None]:
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> AsyncGenerator[bytes, None]:
     """Run the agent loop with streaming, yielding SSE-formatted events.
 
     Event types:
@@ -336,8 +484,15 @@ async def run_agent_stream(
       map_update  - {"lat": float, "lng": float}  map flyTo coordinates
       done        - {}  stream complete
       error       - {"message": "..."}  error occurred
+
+    When Claude requests several tools in one round they run concurrently, each in
+    its own session from session_factory (an AsyncSession is not safe for concurrent
+    use); a single tool call reuses db.
+
+    If the last user message contains a street address, valuate_property for it is
+    started alongside Claude's first response (see _speculate_address).
     """
-    client = AsyncAnthropic(api_key=settings.anthropic_api_key)
+    client = get_anthropic_client()
 
     # The messages list is mutated during the tool loop (assistant + tool_result
     # messages are appended). We work on a copy so the caller's list is untouched.
@@ -345,77 +500,169 @@ async def run_agent_stream(
 
     max_tool_rounds = 5  # safety limit to prevent infinite loops
 
-    for _round in range(max_tool_rounds):
-        # Stream Claude's response
-        try:
-            response = None
-            async with client.messages.stream(
-                model="claude-sonnet-4-20250514",
-                max_tokens=4096,
-                system=SYSTEM_PROMPT,
-                tools=TOOLS,
-                messages=api_messages,
-            ) as stream:
-                async for event in stream:
-                    if (
-                        event.type == "content_block_delta"
-                        and hasattr(event.delta, "text")
-                    ):
-                        yield f"event: text_delta\ndata: {_serialize({'text': event.delta.text})}\n\n"
-
-                response = await stream.get_final_message()
-
-        except Exception as exc:
-            logger.exception("Anthropic API error")
-            yield f"event: error\ndata: {_serialize({'message': str(exc)})}\n\n"
-            return
-
-        # Check if Claude wants to call tools
-        tool_use_blocks = [b for b in response.content if b.type == "tool_use"]
-
-        if not tool_use_blocks:
-            # No tools — we're done
-            yield f"event: done\ndata: {{}}\n\n"
-            return
-
-        # Append assistant message with tool_use content blocks
-        api_messages.append({"role": "assistant", "content": response.content})
-
-        # Execute each tool and collect results
-        tool_results = []
-        for tool_block in tool_use_blocks:
+    # Text frames are coalesced into one write until the buffer is large enough or
+    # has been held long enough; anything else flushes it first so ordering holds.
+    flush_bytes = settings.sse_flush_bytes
+    flush_interval = settings.sse_flush_interval
+    buf = bytearray()
+
+    # Dead-man switch: each event gets its own deadline, so only a stream that stops
+    # delivering (not a long generation) is aborted
+    idle_timeout = settings.agent_stream_idle_timeout
+
+    # Only the first round is speculated; later tool calls always run normally
+    speculation = _speculate_address(api_messages, session_factory)
+
+    try:
+        for _round in range(max_tool_rounds):
+            # Stream Claude's response
             try:
-                result = await execute_tool(tool_block.name, tool_block.input, db)
+                response = None
+                last_flush = time.monotonic()
+                async with client.messages.stream(
+                    **_STREAM_KWARGS, messages=api_messages
+                ) as stream:
+                    events = aiter(stream)
+                    while True:
+                        # The timeout covers only the wait for the next event, never
+                        # the time this generator spends suspended at a yield
+                        try:
+                            async with asyncio.timeout(idle_timeout):
+                                event = await anext(events)
+                        except StopAsyncIteration:
+                            break
+                        # Cheap string compares instead of a hasattr miss per token
+                        if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                            buf += _text_delta_frame(event.delta.text)
+                            now = time.monotonic()
+                            if len(buf) >= flush_bytes or now - last_flush >= flush_interval:
+                                yield bytes(buf)
+                                buf.clear()
+                                last_flush = now
+                            continue
+                        # Other events (e.g. a tool_use input being streamed) must not hold
+                        # back the text before them: flush at the end of the text block, or
+                        # once the interval has passed
+                        if buf:
+                            now = time.monotonic()
+                            if (
+                                event.type == "content_block_stop"
+                                or now - last_flush >= flush_interval
+                            ):
+                                yield bytes(buf)
+                                buf.clear()
+                                last_flush = now
+
+                    response = await stream.get_final_message()
+
+            except TimeoutError:
+                logger.error("Anthropic stream stalled for %gs, aborting", idle_timeout)
+                yield bytes(buf) + _sse("error", {"message": "stream stalled"})
+                return
+
+            except Exception as exc:
+                logger.exception("Anthropic API error")
+                yield bytes(buf) + _sse("error", {"message": str(exc)})
+                return
+
+            if buf:
+                yield bytes(buf)
+                buf.clear()
+
+            # Check if Claude wants to call tools. A natural end_turn never carries a
+            # tool call, so the final answer (the common case) skips the content scan.
+            if response.stop_reason == "end_turn":
+                yield _DONE_EVENT
+                return
+            tool_use_blocks = [b for b in response.content if b.type == "tool_use"]
+
+            if not tool_use_blocks:
+                # No tools — we're done
+                yield _DONE_EVENT
+                return
+
+            # Append assistant message with tool_use content blocks
+            api_messages.append({"role": "assistant", "content": response.content})
+
+            # A first-round valuate_property call for the speculated address reuses
+            # that lookup; a speculation Claude did not ask for is dropped once this
+            # round's tools are done, since their geocode may have joined its lookup
+            prefetched = None
+            if _round == 0 and speculation is not None:
+                address_key, task = speculation
+                prefetched = next(
+                    (
+                        b for b in tool_use_blocks
+                        if b.name == "valuate_property"
+                        and _matches_speculation(b.input, address_key)
+                    ),
+                    None,
+                )
+
+            # Execute the tools (concurrently when there are several) and collect results
+            if len(tool_use_blocks) == 1:
+                block = tool_use_blocks[0]
+                try:
+                    if block is prefetched:
+                        results = [await _finish_speculation(task, block.input)]
+                    else:
+                        results = [await execute_tool(block.name, block.input, db)]
+                except ValueError as exc:
+                    results = [exc]
+            else:
+                results = await asyncio.gather(
+                    *(
+                        _finish_speculation(task, b.input)
+                        if b is prefetched
+                        else _execute_tool_in_session(b.name, b.input, session_factory)
+                        for b in tool_use_blocks
+                    ),
+                    return_exceptions=True,
+                )
+            if _round == 0 and speculation is not None and prefetched is None:
+                _drop_speculation(task)
+
+            tool_results = []
+            for tool_block, result in zip(tool_use_blocks, results):
+                if isinstance(result, ValueError):
+                    logger.warning("Tool %s error: %s", tool_block.name, result)
+                    tool_results.append({
+                        "type": "tool_result",
+                        "tool_use_id": tool_block.id,
+                        "content": _serialize({"error": str(result)}),
+                        "is_error": True,
+                    })
+                    continue
+                if isinstance(result, BaseException):
+                    raise result
+
+                # Encode the result once: it goes both to the frontend and back to Claude
+                result_json = _STATIC_TOOL_RESULTS.get(tool_block.name) or _dumps(result)
 
                 # Send structured data to frontend for inline rendering
-                yield (
-                    f"event: tool_result\n"
-                    f"data: {_serialize({'tool': tool_block.name, 'result': result})}\n\n"
+                yield _sse_raw(
+                    "tool_result",
+                    b'{"tool":' + _dumps(tool_block.name) + b',"result":' + result_json + b"}",
                 )
 
                 # If result has coordinates, send map update
                 if isinstance(result, dict) and "coordinates" in result:
                     coords = result["coordinates"]
-                    yield f"event: map_update\ndata: {_serialize(coords)}\n\n"
-
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": tool_block.id,
-                    "content": _serialize(result),
-                })
+                    yield _sse("map_update", coords)
 
-            except ValueError as exc:
-                logger.warning("Tool %s error: %s", tool_block.name, exc)
                 tool_results.append({
                     "type": "tool_result",
                     "tool_use_id": tool_block.id,
-                    "content": _serialize({"error": str(exc)}),
-                    "is_error": True,
+                    "content": result_json.decode(),
                 })
 
-        # Feed tool results back to Claude for the next round
-        api_messages.append({"role": "user", "content": tool_results})
-        # Loop continues — Claude will process tool results and respond
+            # Feed tool results back to Claude for the next round
+            api_messages.append({"role": "user", "content": tool_results})
+            # Loop continues — Claude will process tool results and respond
 
-    # If we hit the safety limit, end gracefully
-    yield f"event: done\ndata: {{}}\n\n"
+        # If we hit the safety limit, end gracefully
+        yield _DONE_EVENT
+    finally:
+        # Never leave a speculative lookup running after the response is over
+        if speculation is not None:
+            _drop_speculation(speculation[1])
@@ -0,0 +1,29 @@
+"""Small in-process caches shared by the services."""
+
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Size-bounded LRU mapping with a per-entry TTL on the monotonic clock."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._data: OrderedDict[object, tuple[object, float]] = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl = ttl
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value) -> None:
+        self._data[key] = (value, time.monotonic() + self._ttl)
+        self._data.move_to_end(key)
+        if len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
@@ -11,7 +11,19 @@ renovation quality, exposure, noise, and building condition.
 
 from __future__ import annotations
 
+import sys
+from collections.abc import Mapping
 from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import NamedTuple
+
+import numpy as np
+import orjson
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 # ---------------------------------------------------------------------------
 # Coefficient Tables
@@ -20,62 +32,69 @@ from dataclasses import dataclass, field
 # Positive = premium, negative = discount.
 # Keys are used in the API request; labels are for display.
 
-COEFFICIENTS: dict[str, dict[str, dict]] = {
+
+class CoefficientOption(NamedTuple):
+    pct: float
+    label: str
+    label_en: str
+
+
+COEFFICIENTS: Mapping[str, Mapping[str, CoefficientOption]] = {
     "renovation": {
-        "premium_post_2015": {"pct": 0.10, "label": "Ristrutturazione integrale post-2015", "label_en": "Premium renovation post-2015"},
-        "standard_recent": {"pct": 0.05, "label": "Ristrutturazione parziale/recente", "label_en": "Standard/recent renovation"},
-        "none": {"pct": 0.0, "label": "Nessuna ristrutturazione", "label_en": "No renovation"},
-        "needs_work": {"pct": -0.10, "label": "Da ristrutturare", "label_en": "Needs renovation"},
+        "premium_post_2015": CoefficientOption(0.10, "Ristrutturazione integrale post-2015", "Premium renovation post-2015"),
+        "standard_recent": CoefficientOption(0.05, "Ristrutturazione parziale/recente", "Standard/recent renovation"),
+        "none": CoefficientOption(0.0, "Nessuna ristrutturazione", "No renovation"),
+        "needs_work": CoefficientOption(-0.10, "Da ristrutturare", "Needs renovation"),
     },
     "floor": {
-        "ground_semi": {"pct": -0.05, "label": "Piano terra / seminterrato", "label_en": "Ground / semi-basement"},
-        "first": {"pct": -0.02, "label": "Primo piano", "label_en": "First floor"},
-        "second": {"pct": 0.0, "label": "Secondo piano", "label_en": "Second floor"},
-        "third_fourth": {"pct": 0.05, "label": "Terzo / quarto piano", "label_en": "Third / fourth floor"},
-        "fifth_plus": {"pct": 0.04, "label": "Quinto piano e oltre", "label_en": "Fifth floor and above"},
-        "penthouse": {"pct": 0.08, "label": "Attico / ultimo piano", "label_en": "Penthouse / top floor"},
+        "ground_semi": CoefficientOption(-0.05, "Piano terra / seminterrato", "Ground / semi-basement"),
+        "first": CoefficientOption(-0.02, "Primo piano", "First floor"),
+        "second": CoefficientOption(0.0, "Secondo piano", "Second floor"),
+        "third_fourth": CoefficientOption(0.05, "Terzo / quarto piano", "Third / fourth floor"),
+        "fifth_plus": CoefficientOption(0.04, "Quinto piano e oltre", "Fifth floor and above"),
+        "penthouse": CoefficientOption(0.08, "Attico / ultimo piano", "Penthouse / top floor"),
     },
     "exposure": {
-        "south_dual": {"pct": 0.05, "label": "Sud / doppia esposizione", "label_en": "South / dual exposure"},
-        "east_west": {"pct": 0.02, "label": "Est / Ovest", "label_en": "East / West"},
-        "north_only": {"pct": -0.05, "label": "Solo Nord", "label_en": "North only"},
-        "internal_dark": {"pct": -0.08, "label": "Interno / poco luminoso", "label_en": "Internal / low light"},
+        "south_dual": CoefficientOption(0.05, "Sud / doppia esposizione", "South / dual exposure"),
+        "east_west": CoefficientOption(0.02, "Est / Ovest", "East / West"),
+        "north_only": CoefficientOption(-0.05, "Solo Nord", "North only"),
+        "internal_dark": CoefficientOption(-0.08, "Interno / poco luminoso", "Internal / low light"),
     },
     "noise": {
-        "very_silent": {"pct": 0.03, "label": "Molto silenzioso", "label_en": "Very silent"},
-        "silent_courtyard": {"pct": 0.02, "label": "Cortile interno / silenzioso", "label_en": "Internal courtyard / silent"},
-        "normal": {"pct": 0.0, "label": "Normale", "label_en": "Normal"},
-        "street_moderate": {"pct": -0.02, "label": "Strada moderata", "label_en": "Moderate street noise"},
-        "busy_street": {"pct": -0.05, "label": "Strada trafficata", "label_en": "Busy street"},
+        "very_silent": CoefficientOption(0.03, "Molto silenzioso", "Very silent"),
+        "silent_courtyard": CoefficientOption(0.02, "Cortile interno / silenzioso", "Internal courtyard / silent"),
+        "normal": CoefficientOption(0.0, "Normale", "Normal"),
+        "street_moderate": CoefficientOption(-0.02, "Strada moderata", "Moderate street noise"),
+        "busy_street": CoefficientOption(-0.05, "Strada trafficata", "Busy street"),
     },
     "common_areas": {
-        "excellent": {"pct": 0.02, "label": "Ottime condizioni", "label_en": "Excellent condition"},
-        "good": {"pct": 0.0, "label": "Buone condizioni", "label_en": "Good condition"},
-        "needs_maintenance": {"pct": -0.02, "label": "Necessita manutenzione", "label_en": "Needs maintenance"},
-        "poor": {"pct": -0.05, "label": "Cattive condizioni", "label_en": "Poor condition"},
-        "serious_neglect": {"pct": -0.07, "label": "Gravi carenze", "label_en": "Serious neglect"},
+        "excellent": CoefficientOption(0.02, "Ottime condizioni", "Excellent condition"),
+        "good": CoefficientOption(0.0, "Buone condizioni", "Good condition"),
+        "needs_maintenance": CoefficientOption(-0.02, "Necessita manutenzione", "Needs maintenance"),
+        "poor": CoefficientOption(-0.05, "Cattive condizioni", "Poor condition"),
+        "serious_neglect": CoefficientOption(-0.07, "Gravi carenze", "Serious neglect"),
     },
     "building_facade": {
-        "recently_restored": {"pct": 0.02, "label": "Recentemente restaurata", "label_en": "Recently restored"},
-        "good_condition": {"pct": 0.0, "label": "Buone condizioni", "label_en": "Good condition"},
-        "needs_work": {"pct": -0.02, "label": "Necessita intervento", "label_en": "Needs work"},
-        "visibly_degraded": {"pct": -0.05, "label": "Visibilmente degradata", "label_en": "Visibly degraded"},
+        "recently_restored": CoefficientOption(0.02, "Recentemente restaurata", "Recently restored"),
+        "good_condition": CoefficientOption(0.0, "Buone condizioni", "Good condition"),
+        "needs_work": CoefficientOption(-0.02, "Necessita intervento", "Needs work"),
+        "visibly_degraded": CoefficientOption(-0.05, "Visibilmente degradata", "Visibly degraded"),
     },
     "energy_class": {
-        "A_B": {"pct": 0.05, "label": "Classe A o B", "label_en": "Class A or B"},
-        "C_D": {"pct": 0.02, "label": "Classe C o D", "label_en": "Class C or D"},
-        "E": {"pct": 0.0, "label": "Classe E", "label_en": "Class E"},
-        "F_G": {"pct": -0.05, "label": "Classe F o G", "label_en": "Class F or G"},
+        "A_B": CoefficientOption(0.05, "Classe A o B", "Class A or B"),
+        "C_D": CoefficientOption(0.02, "Classe C o D", "Class C or D"),
+        "E": CoefficientOption(0.0, "Classe E", "Class E"),
+        "F_G": CoefficientOption(-0.05, "Classe F o G", "Class F or G"),
     },
     "elevator": {
-        "yes": {"pct": 0.0, "label": "Presente", "label_en": "Yes"},
-        "no_low_floor": {"pct": 0.0, "label": "Assente (piano basso)", "label_en": "No (low floor)"},
-        "no_high_floor": {"pct": -0.05, "label": "Assente (piano alto)", "label_en": "No (high floor)"},
+        "yes": CoefficientOption(0.0, "Presente", "Yes"),
+        "no_low_floor": CoefficientOption(0.0, "Assente (piano basso)", "No (low floor)"),
+        "no_high_floor": CoefficientOption(-0.05, "Assente (piano alto)", "No (high floor)"),
     },
 }
 
 # Factor display names (Italian primary, English secondary)
-FACTOR_LABELS: dict[str, dict[str, str]] = {
+FACTOR_LABELS: Mapping[str, Mapping[str, str]] = {
     "renovation": {"it": "Ristrutturazione", "en": "Renovation"},
     "floor": {"it": "Piano", "en": "Floor"},
     "exposure": {"it": "Esposizione / Luminosita", "en": "Exposure / Light"},
@@ -86,6 +105,22 @@ FACTOR_LABELS: dict[str, dict[str, str]] = {
     "elevator": {"it": "Ascensore", "en": "Elevator"},
 }
 
+# The tables are shared, process-wide constants: expose them read-only
+COEFFICIENTS = MappingProxyType({k: MappingProxyType(v) for k, v in COEFFICIENTS.items()})
+FACTOR_LABELS = MappingProxyType({k: MappingProxyType(v) for k, v in FACTOR_LABELS.items()})
+
+
+# Flat lookup built once at import: (factor, option key) -> (pct, factor label, option label)
+_FLAT: dict[tuple[str, str], tuple[float, str, str]] = {
+    (factor_name, key): (
+        option.pct,
+        FACTOR_LABELS.get(factor_name, {}).get("it", factor_name),
+        option.label or key,
+    )
+    for factor_name, options in COEFFICIENTS.items()
+    for key, option in options.items()
+}
+
 
 # ---------------------------------------------------------------------------
 # Data Classes for Results
@@ -131,6 +166,28 @@ class AdjustedEstimate:
 # Core Computation
 # ---------------------------------------------------------------------------
 
+def _coefficient_kernel(pcts, omi_min: float, omi_max: float):
+    """Numeric core of compute_adjusted_estimate, on unrounded floats.
+
+    Returns (total_pct, adjusted_min, adjusted_max, adjusted_mid, impacts per factor).
+    Written so the same source runs as plain Python or compiled by numba; rounding is
+    left to the caller so both paths give identical results.
+    """
+    total = 0.0
+    for i in range(len(pcts)):
+        total += pcts[i]
+    base_mid = (omi_min + omi_max) / 2
+    multiplier = 1.0 + total
+    impacts = [base_mid * pcts[i] for i in range(len(pcts))]
+    return total, omi_min * multiplier, omi_max * multiplier, base_mid * multiplier, impacts
+
+
+# numba is optional (the "jit" extra). Its dispatch costs about a microsecond, so the
+# compiled kernel only pays off when several factors are set.
+_JIT_MIN_FACTORS = 4
+_jit_kernel = njit(cache=True)(_coefficient_kernel) if njit is not None else None
+
+
 def compute_adjusted_estimate(
     omi_price_min: float,
     omi_price_max: float,
@@ -149,37 +206,70 @@ def compute_adjusted_estimate(
     Returns:
         AdjustedEstimate with adjusted prices, totals, and coefficient breakdown.
     """
-    breakdown: list[CoefficientBreakdownItem] = []
-    total_pct = 0.0
-    base_mid = (omi_price_min + omi_price_max) / 2
+    conservation_state = property_details.get("conservation_state", "NORMALE")
 
-    for factor_name, options in COEFFICIENTS.items():
-        selected_key = property_details.get(factor_name)
-        if not selected_key or selected_key not in options:
-            continue
+    # No factor selected yet (typical first enhanced call): the estimate is the OMI range
+    if not COEFFICIENTS.keys() & property_details.keys():
+        adj_min = round(float(omi_price_min), 2)
+        adj_max = round(float(omi_price_max), 2)
+        adj_mid = round((omi_price_min + omi_price_max) / 2, 2)
+        return AdjustedEstimate(
+            base_price_min=omi_price_min,
+            base_price_max=omi_price_max,
+            base_conservation_state=conservation_state,
+            total_coefficient=0.0,
+            adjusted_price_min=adj_min,
+            adjusted_price_max=adj_max,
+            adjusted_mid=adj_mid,
+            total_min=round(adj_min * surface_m2, 2),
+            total_max=round(adj_max * surface_m2, 2),
+            total_mid=round(adj_mid * surface_m2, 2),
+            surface_m2=surface_m2,
+        )
 
-        option = options[selected_key]
-        pct = option["pct"]
-        total_pct += pct
+    # Loop over the supplied details only; unknown factors/keys miss the flat table.
+    # Keys decoded from a request body are fresh strings: interning them lets the
+    # _FLAT tuple comparison hit the identity fast path against the table literals.
+    # A non-string value (null, a number) can match no key and is skipped as before.
+    selected: list[tuple[str, str, float, str, str]] = []
+    for factor_name, selected_key in property_details.items():
+        if factor_name == "conservation_state":
+            continue
+        factor_name = sys.intern(factor_name)
+        if isinstance(selected_key, str):
+            selected_key = sys.intern(selected_key)
+        entry = _FLAT.get((factor_name, selected_key))
+        if entry is None:
+            continue
+        selected.append((factor_name, selected_key, *entry))
 
-        factor_label = FACTOR_LABELS.get(factor_name, {}).get("it", factor_name)
-        selected_label = option.get("label", selected_key)
+    pcts = [item[2] for item in selected]
+    if _jit_kernel is not None and len(pcts) >= _JIT_MIN_FACTORS:
+        total_pct, raw_min, raw_max, raw_mid, impacts = _jit_kernel(
+            np.array(pcts, dtype=np.float64), float(omi_price_min), float(omi_price_max)
+        )
+    else:
+        total_pct, raw_min, raw_max, raw_mid, impacts = _coefficient_kernel(
+            pcts, omi_price_min, omi_price_max
+        )
 
-        breakdown.append(CoefficientBreakdownItem(
+    breakdown = [
+        CoefficientBreakdownItem(
             factor=factor_name,
             factor_label=factor_label,
             selected_key=selected_key,
             selected_label=selected_label,
             coefficient=pct,
-            impact_eur_m2=round(base_mid * pct, 2),
-        ))
-
-    multiplier = 1.0 + total_pct
-    adj_min = round(omi_price_min * multiplier, 2)
-    adj_max = round(omi_price_max * multiplier, 2)
-    adj_mid = round(base_mid * multiplier, 2)
+            impact_eur_m2=round(float(impact), 2),
+        )
+        for (factor_name, selected_key, pct, factor_label, selected_label), impact
+        in zip(selected, impacts)
+    ]
 
-    conservation_state = property_details.get("conservation_state", "NORMALE")
+    adj_min = round(float(raw_min), 2)
+    adj_max = round(float(raw_max), 2)
+    adj_mid = round(float(raw_mid), 2)
+    total_pct = float(total_pct)
 
     return AdjustedEstimate(
         base_price_min=omi_price_min,
@@ -197,6 +287,155 @@ def compute_adjusted_estimate(
     )
 
 
+# Column order of the coefficient matrix used by the batch path
+FACTOR_ORDER: tuple[str, ...] = tuple(COEFFICIENTS)
+
+
+@dataclass
+class BatchAdjustedEstimate:
+    """Column-wise results of compute_adjusted_estimate_batch, one entry per property."""
+    total_coefficient: np.ndarray
+    adjusted_price_min: np.ndarray
+    adjusted_price_max: np.ndarray
+    adjusted_mid: np.ndarray
+    total_min: np.ndarray
+    total_max: np.ndarray
+    total_mid: np.ndarray
+
+
+def build_coefficient_matrix(details_list: list[dict[str, str]]) -> np.ndarray:
+    """Build the (N, F) matrix of selected pcts, columns in FACTOR_ORDER.
+
+    Unset factors and unknown keys contribute 0, as in compute_adjusted_estimate.
+    """
+    matrix = np.zeros((len(details_list), len(FACTOR_ORDER)), dtype=np.float64)
+    for row, details in enumerate(details_list):
+        for col, factor_name in enumerate(FACTOR_ORDER):
+            key = details.get(factor_name)
+            if key is not None:
+                entry = _FLAT.get((factor_name, key))
+                if entry is not None:
+                    matrix[row, col] = entry[0]
+    return matrix
+
+
+def compute_adjusted_estimate_batch(
+    omi_mins: np.ndarray,
+    omi_maxs: np.ndarray,
+    surfaces: np.ndarray,
+    coeff_matrix: np.ndarray,
+) -> BatchAdjustedEstimate:
+    """Vectorized compute_adjusted_estimate for bulk valuations (CSV import, portfolios).
+
+    Args:
+        omi_mins: OMI EUR/m2 minimum per property, shape (N,).
+        omi_maxs: OMI EUR/m2 maximum per property, shape (N,).
+        surfaces: Surface area in m2 per property, shape (N,).
+        coeff_matrix: Selected pct per factor, shape (N, F); see build_coefficient_matrix.
+
+    Returns:
+        BatchAdjustedEstimate with one array per result column. No breakdown is built;
+        call compute_adjusted_estimate for the rows that are actually displayed.
+    """
+    omi_mins = np.asarray(omi_mins, dtype=np.float64)
+    omi_maxs = np.asarray(omi_maxs, dtype=np.float64)
+    surfaces = np.asarray(surfaces, dtype=np.float64)
+
+    total_pct = np.asarray(coeff_matrix, dtype=np.float64).sum(axis=1)
+    multiplier = 1.0 + total_pct
+    adj_min = np.round(omi_mins * multiplier, 2)
+    adj_max = np.round(omi_maxs * multiplier, 2)
+    adj_mid = np.round((omi_mins + omi_maxs) / 2 * multiplier, 2)
+
+    return BatchAdjustedEstimate(
+        total_coefficient=np.round(total_pct, 4),
+        adjusted_price_min=adj_min,
+        adjusted_price_max=adj_max,
+        adjusted_mid=adj_mid,
+        total_min=np.round(adj_min * surfaces, 2),
+        total_max=np.round(adj_max * surfaces, 2),
+        total_mid=np.round(adj_mid * surfaces, 2),
+    )
+
+
+# Below this many comparables, numpy's per-call overhead outweighs the vectorized loop
+_NUMPY_MIN_COMPARABLES = 16
+
+# Rough conversion: 1 vano catastale ~ 17 m2 (cat. A average)
+_M2_PER_VANO = 17.0
+
+
+def _closest_eur_m2(adjusted_eur_m2: float, comparables: list[dict]) -> float | None:
+    """Return the comparable EUR/m2 closest to the estimate, or None if none is computable.
+
+    Keeps a running minimum instead of collecting a list; only an exact match, which
+    no later comparable can beat, ends the scan early.
+    """
+    best: float | None = None
+    best_diff = float("inf")
+    for comp in comparables:
+        price = float(comp.get("declared_price") or 0)
+        if price <= 0:
+            continue
+        mq = float(comp.get("cadastral_mq") or 0)
+        if mq > 0:
+            eur_m2 = price / mq
+        else:
+            vani = float(comp.get("cadastral_vani") or 0)
+            if vani <= 0:
+                continue
+            eur_m2 = price / (vani * _M2_PER_VANO)
+
+        diff = abs(eur_m2 - adjusted_eur_m2)
+        if diff < best_diff:
+            best, best_diff = eur_m2, diff
+            if diff == 0:
+                break
+
+    return best
+
+
+def comparable_eur_m2(comparables: list[dict]) -> np.ndarray:
+    """EUR/m2 of every comparable with a price and a usable surface, shape (M,).
+
+    Compute once per zone and reuse it across rows with closest_eur_m2_batch.
+    """
+    n = len(comparables)
+    prices = np.fromiter((c.get("declared_price") or 0 for c in comparables), np.float64, n)
+    mqs = np.fromiter((c.get("cadastral_mq") or 0 for c in comparables), np.float64, n)
+    vanis = np.fromiter((c.get("cadastral_vani") or 0 for c in comparables), np.float64, n)
+
+    # Prefer the m2 surface; fall back to vani converted to m2
+    surface = np.where(mqs > 0, mqs, vanis * _M2_PER_VANO)
+    valid = (prices > 0) & (surface > 0)
+    return prices[valid] / surface[valid]
+
+
+def _closest_eur_m2_vectorized(adjusted_eur_m2: float, comparables: list[dict]) -> float | None:
+    """numpy version of _closest_eur_m2 for zones with many comparables."""
+    eur_m2 = comparable_eur_m2(comparables)
+    if not eur_m2.size:
+        return None
+    return float(eur_m2[np.abs(eur_m2 - adjusted_eur_m2).argmin()])
+
+
+def closest_eur_m2_batch(adjusted_eur_m2: np.ndarray, eur_m2: np.ndarray) -> np.ndarray:
+    """Closest comparable EUR/m2 for each adjusted estimate, shape (N,).
+
+    Args:
+        adjusted_eur_m2: Adjusted midpoints, e.g. BatchAdjustedEstimate.adjusted_mid.
+        eur_m2: Output of comparable_eur_m2 for the zone.
+
+    Returns:
+        The closest value per row, or NaN everywhere when the zone has no usable comparable.
+    """
+    adjusted_eur_m2 = np.asarray(adjusted_eur_m2, dtype=np.float64)
+    if not eur_m2.size:
+        return np.full(adjusted_eur_m2.shape, np.nan)
+    idx = np.abs(adjusted_eur_m2[:, None] - eur_m2[None, :]).argmin(axis=1)
+    return eur_m2[idx]
+
+
 def compare_with_benchmarks(
     adjusted_eur_m2: float,
     comparables: list[dict],
@@ -218,29 +457,17 @@ def compare_with_benchmarks(
                  "L'aggiunta di dati reali di vendita migliorerebbe significativamente l'accuratezza.",
         )
 
-    # Try to compute EUR/m2 for each comparable
-    comparable_eur_m2: list[float] = []
-    for comp in comparables:
-        price = comp.get("declared_price")
-        mq = comp.get("cadastral_mq")
-        vani = comp.get("cadastral_vani")
-
-        if price and price > 0:
-            if mq and mq > 0:
-                comparable_eur_m2.append(price / mq)
-            elif vani and vani > 0:
-                # Rough conversion: 1 vano catastale ~ 17 m2 (cat. A average)
-                estimated_mq = vani * 17.0
-                comparable_eur_m2.append(price / estimated_mq)
-
-    if not comparable_eur_m2:
+    if len(comparables) >= _NUMPY_MIN_COMPARABLES:
+        closest = _closest_eur_m2_vectorized(adjusted_eur_m2, comparables)
+    else:
+        closest = _closest_eur_m2(adjusted_eur_m2, comparables)
+
+    if closest is None:
         return BenchmarkComparison(
             has_comparables=True,
             note="Transazioni disponibili ma senza dati di superficie sufficienti per calcolare EUR/m2.",
         )
 
-    # Find closest comparable
-    closest = min(comparable_eur_m2, key=lambda x: abs(x - adjusted_eur_m2))
     diff_pct = round((adjusted_eur_m2 - closest) / closest * 100, 1)
     abs_diff = abs(diff_pct)
 
@@ -268,12 +495,8 @@ def compare_with_benchmarks(
     )
 
 
-def get_coefficient_options() -> dict:
-    """Return all coefficient factors with their options, for the frontend wizard.
-
-    Returns a dict suitable for JSON serialization with factor names, labels,
-    and option lists.
-    """
+def _build_coefficient_options() -> dict:
+    """Build the factor/option listing from the coefficient tables."""
     result = {}
     for factor_name, options in COEFFICIENTS.items():
         labels = FACTOR_LABELS.get(factor_name, {})
@@ -281,9 +504,9 @@ def get_coefficient_options() -> dict:
         for key, opt in options.items():
             factor_options.append({
                 "key": key,
-                "label": opt["label"],
-                "label_en": opt.get("label_en", ""),
-                "pct": opt["pct"],
+                "label": opt.label,
+                "label_en": opt.label_en,
+                "pct": opt.pct,
             })
         result[factor_name] = {
             "label": labels.get("it", factor_name),
@@ -291,3 +514,17 @@ def get_coefficient_options() -> dict:
             "options": factor_options,
         }
     return result
+
+
+# The tables are constants, so the listing (and its JSON encoding) is built once
+_CACHED_OPTIONS = _build_coefficient_options()
+COEFFICIENT_OPTIONS_JSON: bytes = orjson.dumps({"factors": _CACHED_OPTIONS})
+
+
+def get_coefficient_options() -> dict:
+    """Return all coefficient factors with their options, for the frontend wizard.
+
+    Returns a dict suitable for JSON serialization with factor names, labels,
+    and option lists. The dict is shared between callers: treat it as read-only.
+    """
+    return _CACHED_OPTIONS
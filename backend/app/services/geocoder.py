@@ -1,21 +1,72 @@
 """Geocoding service with Nominatim primary and Google fallback.
 
-Includes a database cache for permanent storage of results.
+Includes a database cache for permanent storage of results, and an optional
+Redis cache in front of it (set REDIS_URL and install the "redis" extra).
 """
 
 import asyncio
 import logging
+import re
+import unicodedata
 from dataclasses import dataclass
 
+import orjson
+from geopy.adapters import AioHTTPAdapter
 from geopy.geocoders import GoogleV3, Nominatim
-from geopy.extra.rate_limiter import RateLimiter
+from geopy.extra.rate_limiter import AsyncRateLimiter
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.database import async_session
+from app.services.cache import TTLCache
+
+try:
+    from redis.asyncio import Redis
+except ImportError:
+    Redis = None
 
 logger = logging.getLogger(__name__)
 
+# Redis entries expire after 30 days; the Postgres cache stays the permanent store
+REDIS_CACHE_TTL = 30 * 24 * 3600
+
+# Hot addresses are answered from process memory before Redis or the DB are asked
+MEMORY_CACHE_SIZE = 10_000
+MEMORY_CACHE_TTL = 3600.0
+
+# New cache rows are written in the background, batched by count or age
+CACHE_WRITE_BATCH = 500
+CACHE_WRITE_INTERVAL = 1.0
+
+_SELECT_CACHE = text("""
+    SELECT lat, lng, source FROM omi.geocode_cache WHERE address IN (:key, :addr) LIMIT 1
+""")
+
+_INSERT_CACHE = text("""
+    INSERT INTO omi.geocode_cache (address, lat, lng, source)
+    VALUES (:addr, :lat, :lng, :source)
+    ON CONFLICT (address) DO NOTHING
+""")
+
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_address(address: str) -> str:
+    """Cache key for an address: casefolded, accents and punctuation dropped, spaces collapsed.
+
+    "Via Sant'Andrea, 3 - Milano" and "via sant andrea 3 milano" share one key.
+    Providers still receive the address as typed.
+    """
+    decomposed = unicodedata.normalize("NFKD", address.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(_PUNCT_RE.sub(" ", stripped).split())
+
+
+class _LookupAbandoned(Exception):
+    """Set on a shared lookup whose owner was cancelled; its waiters retry it."""
+
 
 @dataclass
 class GeoResult:
@@ -26,62 +77,214 @@ class GeoResult:
 
 class ItalianGeocoder:
     def __init__(self):
-        self.nominatim = Nominatim(user_agent="vendocasa_personal/1.0", timeout=10)
-        self._geocode_nom = RateLimiter(self.nominatim.geocode, min_delay_seconds=1.0)
+        # Both providers share the event loop through aiohttp; each adapter keeps one
+        # pooled session (created on first use) so TLS connections are reused
+        self.nominatim = Nominatim(
+            user_agent="vendocasa_personal/1.0", timeout=10, adapter_factory=AioHTTPAdapter
+        )
+        self._geocode_nom = AsyncRateLimiter(self.nominatim.geocode, min_delay_seconds=1.0)
         self.google = (
-            GoogleV3(api_key=settings.google_geocoding_api_key)
+            GoogleV3(
+                api_key=settings.google_geocoding_api_key, adapter_factory=AioHTTPAdapter
+            )
             if settings.google_geocoding_api_key
             else None
         )
+        self.redis = None
+        if settings.redis_url:
+            if Redis is None:
+                logger.warning("REDIS_URL is set but the redis package is not installed")
+            else:
+                self.redis = Redis.from_url(settings.redis_url)
+        self._mem = TTLCache(MEMORY_CACHE_SIZE, MEMORY_CACHE_TTL)
+        # Lookups in progress, so concurrent requests for one address share a single
+        # provider call instead of queueing N of them behind the rate limiter
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._write_queue: asyncio.Queue | None = None
+        self._writer: asyncio.Task | None = None
+
+    async def close(self) -> None:
+        """Close the providers' HTTP sessions."""
+        await self.nominatim.__aexit__(None, None, None)
+        if self.google:
+            await self.google.__aexit__(None, None, None)
 
     async def geocode(self, address: str, db: AsyncSession) -> GeoResult | None:
         """Geocode an address, checking cache first."""
-        # 1. Check DB cache
-        cached = await self._get_cached(address, db)
+        key = normalize_address(address)
+        cached = self._mem.get(key)
         if cached:
             return cached
 
-        # 2. Try Nominatim (run sync geocoder in thread)
+        while (inflight := self._inflight.get(key)) is not None:
+            try:
+                # shield: a cancelled waiter must not cancel the lookup others wait on
+                return await asyncio.shield(inflight)
+            except _LookupAbandoned:
+                # The owner was cancelled, not this caller: take the lookup over (or
+                # join whichever waiter already did)
+                continue
+
+        fut = asyncio.get_running_loop().create_future()
+        # Mark the outcome as retrieved: with no waiters asyncio would log the error again
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = fut
+        try:
+            result = await self._geocode_uncached(address, key, db)
+        except asyncio.CancelledError:
+            # Never cancel the shared future: the waiters were not cancelled
+            fut.set_exception(_LookupAbandoned())
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            if result:
+                self._mem.put(key, result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def geocode_many(
+        self, addresses: list[str], concurrency: int = 10
+    ) -> list[GeoResult | None]:
+        """Geocode many addresses concurrently, in input order.
+
+        Each lookup runs in its own session (an AsyncSession is not safe for concurrent
+        use), at most `concurrency` at a time. Cache hits and Google fallbacks overlap;
+        Nominatim calls stay serialized by its 1 req/s rate limiter, per its usage policy.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(address: str) -> GeoResult | None:
+            async with sem, async_session() as session:
+                return await self.geocode(address, session)
+
+        return await asyncio.gather(*(one(a) for a in addresses))
+
+    async def _geocode_uncached(
+        self, address: str, key: str, db: AsyncSession
+    ) -> GeoResult | None:
+        # 1. Check Redis, then the DB cache
+        redis_key = "geo:" + key
+        cached = await self._get_redis(redis_key)
+        if cached:
+            return cached
+
+        cached = await self._get_cached(key, address, db)
+        if cached:
+            await self._set_redis(redis_key, cached)
+            return cached
+
+        # 2. Try Nominatim (rate limited to 1 req/s)
         result = await self._try_nominatim(address)
         if result:
-            await self._save_cache(address, result, db)
+            await self._save_cache(key, result, db)
+            await self._set_redis(redis_key, result)
             return result
 
         # 3. Fallback to Google
         if self.google:
             result = await self._try_google(address)
             if result:
-                await self._save_cache(address, result, db)
+                await self._save_cache(key, result, db)
+                await self._set_redis(redis_key, result)
                 return result
 
         return None
 
-    async def _get_cached(self, address: str, db: AsyncSession) -> GeoResult | None:
-        result = await db.execute(
-            text("SELECT lat, lng, source FROM omi.geocode_cache WHERE address = :addr"),
-            {"addr": address},
+    async def _get_redis(self, key: str) -> GeoResult | None:
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(key)
+        except Exception as e:
+            # Redis is only an accelerator: fall back to the DB cache when it is down
+            logger.warning(f"Redis get failed for '{key}': {e}")
+            return None
+        if raw is None:
+            return None
+        data = orjson.loads(raw)
+        return GeoResult(lat=data["lat"], lng=data["lng"], source=data["source"])
+
+    async def _set_redis(self, key: str, result: GeoResult):
+        if self.redis is None:
+            return
+        payload = orjson.dumps(
+            {"lat": round(result.lat, 6), "lng": round(result.lng, 6), "source": result.source}
         )
+        try:
+            await self.redis.setex(key, REDIS_CACHE_TTL, payload)
+        except Exception as e:
+            logger.warning(f"Redis set failed for '{key}': {e}")
+
+    async def _get_cached(self, key: str, address: str, db: AsyncSession) -> GeoResult | None:
+        # Rows are stored under the normalized key; older ones under the raw address
+        result = await db.execute(_SELECT_CACHE, {"key": key, "addr": address})
         row = result.first()
         if row:
             return GeoResult(lat=row.lat, lng=row.lng, source=row.source)
         return None
 
     async def _save_cache(self, address: str, result: GeoResult, db: AsyncSession):
-        await db.execute(
-            text("""
-                INSERT INTO omi.geocode_cache (address, lat, lng, source)
-                VALUES (:addr, :lat, :lng, :source)
-                ON CONFLICT (address) DO NOTHING
-            """),
-            {"addr": address, "lat": result.lat, "lng": result.lng, "source": result.source},
-        )
+        row = {"addr": address, "lat": result.lat, "lng": result.lng, "source": result.source}
+        if self._write_queue is not None:
+            self._write_queue.put_nowait(row)
+            return
+        # No background writer (scripts, one-off use): write through the caller's session
+        await db.execute(_INSERT_CACHE, row)
         await db.commit()
 
+    def start_cache_writer(self) -> None:
+        """Start the background task that batches geocode_cache inserts."""
+        self._write_queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._cache_writer(self._write_queue))
+
+    async def stop_cache_writer(self) -> None:
+        """Flush pending cache rows and stop the background writer."""
+        if self._write_queue is None:
+            return
+        self._write_queue.put_nowait(None)
+        self._write_queue = None
+        await self._writer
+        self._writer = None
+
+    async def _cache_writer(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await queue.get()
+            if row is None:
+                return
+            batch = [row]
+            deadline = loop.time() + CACHE_WRITE_INTERVAL
+            while len(batch) < CACHE_WRITE_BATCH:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(queue.get(), remaining)
+                except TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._write_cache_rows(batch)
+
+    async def _write_cache_rows(self, rows: list[dict]):
+        # One executemany and one commit for the whole batch
+        try:
+            async with async_session() as session:
+                await session.execute(_INSERT_CACHE, rows)
+                await session.commit()
+        except Exception:
+            logger.exception(f"Failed to write {len(rows)} geocode cache rows")
+
     async def _try_nominatim(self, address: str) -> GeoResult | None:
         try:
-            loc = await asyncio.to_thread(
-                self._geocode_nom, address, country_codes="it"
-            )
+            loc = await self._geocode_nom(address, country_codes="it")
             if loc:
                 logger.info(f"Nominatim geocoded '{address}' -> ({loc.latitude}, {loc.longitude})")
                 return GeoResult(lat=loc.latitude, lng=loc.longitude, source="nominatim")
@@ -91,9 +294,7 @@ class ItalianGeocoder:
 
     async def _try_google(self, address: str) -> GeoResult | None:
         try:
-            loc = await asyncio.to_thread(
-                self.google.geocode, address, region="it"
-            )
+            loc = await self.google.geocode(address, region="it")
             if loc:
                 logger.info(f"Google geocoded '{address}' -> ({loc.latitude}, {loc.longitude})")
                 return GeoResult(lat=loc.latitude, lng=loc.longitude, source="google")
@@ -1,16 +1,68 @@
 """Valuation service: combines geocoding, zone lookup, and quotation retrieval."""
 
+import asyncio
+
+import orjson
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database import read_session
+from app.services.cache import TTLCache
 from app.services.coefficients import (
     compute_adjusted_estimate,
     compare_with_benchmarks,
 )
-from app.services.geocoder import GeoResult, geocoder
+from app.services.geocoder import GeoResult, geocoder, normalize_address
 from app.services.zone_lookup import ZoneResult, find_zone, get_latest_semester
 
 
+# ---------------------------------------------------------------------------
+# Lookup caches
+# ---------------------------------------------------------------------------
+# A conversation re-valuates the same address many times while the user refines
+# the details. Location and quotations only change on a data import, so both are
+# kept in small per-process LRU caches. Comparables are not cached: transactions
+# are edited through the API.
+
+LOOKUP_CACHE_TTL = 600.0
+LOOKUP_CACHE_SIZE = 1024
+
+_LOCATION_CACHE = TTLCache(LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
+_QUOTATION_CACHE = TTLCache(LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL)
+
+
+# Statements are built once so SQLAlchemy's compiled cache and asyncpg's
+# prepared-statement cache see the same object on every call. Postgres shapes the
+# rows into one JSON array, parsed in a single orjson call.
+_QUOTATIONS = text("""
+    SELECT COALESCE(
+        json_agg(q ORDER BY q.is_prevalent DESC, q.conservation_state), '[]'::json
+    )::text
+    FROM (
+        SELECT property_type_desc, conservation_state, is_prevalent,
+               price_min, price_max, surface_type_sale,
+               rent_min, rent_max, surface_type_rent
+        FROM omi.quotations
+        WHERE link_zona = :link_zona
+          AND semester = :semester
+          AND property_type_code = :ptype
+    ) q
+""")
+
+_COMPARABLES = text("""
+    SELECT COALESCE(json_agg(t ORDER BY t.transaction_date DESC), '[]'::json)::text
+    FROM (
+        SELECT transaction_date, declared_price, cadastral_category,
+               cadastral_vani, cadastral_mq, notes
+        FROM omi.transactions
+        WHERE link_zona = :link_zona
+           OR omi_zone = :zone_code
+        ORDER BY transaction_date DESC
+        LIMIT :limit
+    ) t
+""")
+
+
 # ---------------------------------------------------------------------------
 # Reusable pipeline steps
 # ---------------------------------------------------------------------------
@@ -25,6 +77,11 @@ async def geocode_and_find_zone(
     Returns (coords, zone, semester).
     Raises ValueError if address or zone not found.
     """
+    cache_key = (normalize_address(address), semester)
+    cached = _LOCATION_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     coords = await geocoder.geocode(address, db)
     if not coords:
         raise ValueError(f"Address not found: {address}")
@@ -38,6 +95,7 @@ async def geocode_and_find_zone(
     if not zone:
         raise ValueError(f"No OMI zone found for coordinates ({coords.lat}, {coords.lng})")
 
+    _LOCATION_CACHE.put(cache_key, (coords, zone, semester))
     return coords, zone, semester
 
 
@@ -48,20 +106,17 @@ async def get_quotations(
     db: AsyncSession,
 ) -> list[dict]:
     """Fetch quotations for a zone, semester, and property type."""
+    cache_key = (link_zona, semester, property_type)
+    cached = _QUOTATION_CACHE.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
     result = await db.execute(
-        text("""
-            SELECT property_type_desc, conservation_state, is_prevalent,
-                   price_min, price_max, surface_type_sale,
-                   rent_min, rent_max, surface_type_rent
-            FROM omi.quotations
-            WHERE link_zona = :link_zona
-              AND semester = :semester
-              AND property_type_code = :ptype
-            ORDER BY is_prevalent DESC, conservation_state
-        """),
-        {"link_zona": link_zona, "semester": semester, "ptype": property_type},
+        _QUOTATIONS, {"link_zona": link_zona, "semester": semester, "ptype": property_type}
     )
-    return [dict(row._mapping) for row in result.all()]
+    rows = orjson.loads(result.scalar())
+    _QUOTATION_CACHE.put(cache_key, rows)
+    return list(rows)
 
 
 async def get_comparables(
@@ -72,24 +127,61 @@ async def get_comparables(
 ) -> list[dict]:
     """Fetch comparable transactions for a zone."""
     result = await db.execute(
-        text("""
-            SELECT transaction_date, declared_price, cadastral_category,
-                   cadastral_vani, cadastral_mq, notes
-            FROM omi.transactions
-            WHERE link_zona = :link_zona
-               OR omi_zone = :zone_code
-            ORDER BY transaction_date DESC
-            LIMIT :limit
-        """),
-        {"link_zona": link_zona, "zone_code": zone_code, "limit": limit},
+        _COMPARABLES, {"link_zona": link_zona, "zone_code": zone_code, "limit": limit}
     )
-    return [dict(row._mapping) for row in result.all()]
+    return orjson.loads(result.scalar())
+
+
+async def _quotations_and_comparables(
+    zone: ZoneResult, semester: str, property_type: int, db: AsyncSession
+) -> tuple[list[dict], list[dict]]:
+    """Fetch a zone's quotations and comparables, overlapping the two queries.
+
+    An AsyncSession cannot run two statements at once, so on a quotation cache miss
+    the comparables query goes through a second pooled (read-only) session.
+    """
+    if _QUOTATION_CACHE.get((zone.link_zona, semester, property_type)) is not None:
+        quotations = await get_quotations(zone.link_zona, semester, property_type, db)
+        return quotations, await get_comparables(zone.link_zona, zone.zone_code, db)
+
+    async def comparables_in_own_session() -> list[dict]:
+        async with read_session() as session:
+            return await get_comparables(zone.link_zona, zone.zone_code, session)
+
+    quotations, comparables = await asyncio.gather(
+        get_quotations(zone.link_zona, semester, property_type, db),
+        comparables_in_own_session(),
+    )
+    return quotations, comparables
 
 
 # ---------------------------------------------------------------------------
 # Basic valuation (original endpoint)
 # ---------------------------------------------------------------------------
 
+def simple_estimate(quotations: list[dict], surface_m2: float | None) -> dict | None:
+    """Compute the min/mid/max total from the prevalent quotation, or None."""
+    prevalent = next((q for q in quotations if q.get("is_prevalent")), None)
+    if prevalent is None and quotations:
+        prevalent = quotations[0]
+
+    if not (prevalent and surface_m2):
+        return None
+
+    p_min = float(prevalent["price_min"]) if prevalent["price_min"] else 0
+    p_max = float(prevalent["price_max"]) if prevalent["price_max"] else 0
+    if p_min <= 0 or p_max <= 0:
+        return None
+
+    avg = (p_min + p_max) / 2
+    return {
+        "min": round(p_min * surface_m2, 2),
+        "max": round(p_max * surface_m2, 2),
+        "mid": round(avg * surface_m2, 2),
+        "eur_per_m2_range": [p_min, p_max],
+    }
+
+
 async def valuate_address(
     address: str,
     property_type: int,
@@ -104,26 +196,9 @@ async def valuate_address(
     """
     coords, zone, semester = await geocode_and_find_zone(address, semester, db)
 
-    quotations = await get_quotations(zone.link_zona, semester, property_type, db)
-    comparables = await get_comparables(zone.link_zona, zone.zone_code, db)
-
-    # Compute estimate from prevalent quotation
-    estimate = None
-    prevalent = next((q for q in quotations if q.get("is_prevalent")), None)
-    if prevalent is None and quotations:
-        prevalent = quotations[0]
-
-    if prevalent and surface_m2:
-        p_min = float(prevalent["price_min"]) if prevalent["price_min"] else 0
-        p_max = float(prevalent["price_max"]) if prevalent["price_max"] else 0
-        if p_min > 0 and p_max > 0:
-            avg = (p_min + p_max) / 2
-            estimate = {
-                "min": round(p_min * surface_m2, 2),
-                "max": round(p_max * surface_m2, 2),
-                "mid": round(avg * surface_m2, 2),
-                "eur_per_m2_range": [p_min, p_max],
-            }
+    quotations, comparables = await _quotations_and_comparables(
+        zone, semester, property_type, db
+    )
 
     return {
         "address": address,
@@ -138,7 +213,7 @@ async def valuate_address(
         },
         "semester": semester,
         "quotations": quotations,
-        "estimate": estimate,
+        "estimate": simple_estimate(quotations, surface_m2),
         "comparables": comparables,
     }
 
@@ -168,8 +243,9 @@ async def enhanced_valuate_address(
     """
     coords, zone, semester = await geocode_and_find_zone(address, semester, db)
 
-    quotations = await get_quotations(zone.link_zona, semester, property_type, db)
-    comparables = await get_comparables(zone.link_zona, zone.zone_code, db)
+    quotations, comparables = await _quotations_and_comparables(
+        zone, semester, property_type, db
+    )
 
     if not quotations:
         raise ValueError(
@@ -177,35 +253,37 @@ async def enhanced_valuate_address(
             f"for property type {property_type}"
         )
 
-    # Group quotations by conservation state
+    # Group quotations by conservation state, noting the prevalent and first
+    # usable states in the same pass for the fallback below
     quotations_by_state: dict[str, dict] = {}
+    prevalent_state = first_state = None
     for q in quotations:
         state = q.get("conservation_state", "SCONOSCIUTO")
-        if state and q.get("price_min") and q.get("price_max"):
-            quotations_by_state[state] = {
-                "price_min": float(q["price_min"]),
-                "price_max": float(q["price_max"]),
-                "is_prevalent": q.get("is_prevalent", False),
-                "surface_type_sale": q.get("surface_type_sale"),
-            }
-
-    # Select the base OMI range for the user-chosen conservation state
-    selected_state = property_details.get("conservation_state", "NORMALE")
-    base = quotations_by_state.get(selected_state)
-
-    if not base:
-        # Fallback: use prevalent, or first available state
-        prevalent_state = next(
-            (s for s, v in quotations_by_state.items() if v.get("is_prevalent")),
-            None,
+        if not (state and q.get("price_min") and q.get("price_max")):
+            continue
+        is_prevalent = q.get("is_prevalent", False)
+        quotations_by_state[state] = {
+            "price_min": float(q["price_min"]),
+            "price_max": float(q["price_max"]),
+            "is_prevalent": is_prevalent,
+            "surface_type_sale": q.get("surface_type_sale"),
+        }
+        first_state = first_state or state
+        if is_prevalent and prevalent_state is None:
+            prevalent_state = state
+
+    if first_state is None:
+        raise ValueError(
+            f"No priced quotation for zone {zone.link_zona} in semester {semester} "
+            f"for property type {property_type}"
         )
-        if prevalent_state:
-            base = quotations_by_state[prevalent_state]
-            selected_state = prevalent_state
-        else:
-            first_state = next(iter(quotations_by_state))
-            base = quotations_by_state[first_state]
-            selected_state = first_state
+
+    # Select the base OMI range for the user-chosen conservation state,
+    # falling back to the prevalent, then the first available state
+    selected_state = property_details.get("conservation_state", "NORMALE")
+    if selected_state not in quotations_by_state:
+        selected_state = prevalent_state or first_state
+    base = quotations_by_state[selected_state]
 
     # Apply correction coefficients
     details_for_engine = {k: v for k, v in property_details.items() if k != "conservation_state"}
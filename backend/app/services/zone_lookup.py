@@ -1,6 +1,8 @@
 """PostGIS spatial queries for OMI zone lookup."""
 
+import asyncio
 import logging
+import time
 from dataclasses import dataclass
 
 from sqlalchemy import text
@@ -8,6 +10,35 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
 
+# New semesters arrive at most twice a year, so semester lookups are cached
+# per process: (value, expires_at on the monotonic clock)
+SEMESTER_CACHE_TTL = 300.0
+_LATEST_SEMESTER_CACHE: tuple[str, float] | None = None
+_ALL_SEMESTERS_CACHE: tuple[list[str], float] | None = None
+_SEMESTER_CACHE_LOCK = asyncio.Lock()
+
+
+_FIND_ZONE = text("""
+    WITH pt AS (SELECT ST_SetSRID(ST_MakePoint(:lng, :lat), 4326) AS geom)
+    SELECT c.*
+    FROM (
+        SELECT z.link_zona, z.zone_code, z.fascia, z.municipality_name,
+               z.zone_description,
+               ST_Intersects(z.geom, pt.geom) AS inside,
+               ST_Distance(z.geom::geography, pt.geom::geography) AS dist_m
+        FROM omi.zones z, pt
+        WHERE z.semester = :semester
+          AND z.geom && ST_Expand(pt.geom, 0.003)
+    ) c
+    WHERE c.inside OR c.dist_m <= 200
+    ORDER BY c.inside DESC, c.dist_m
+    LIMIT 1
+""")
+
+# omi.zone_semesters is a one-row-per-semester view refreshed by the importer
+_LATEST_SEMESTER = text("SELECT max(semester) FROM omi.zone_semesters")
+_ALL_SEMESTERS = text("SELECT semester FROM omi.zone_semesters ORDER BY semester DESC")
+
 
 @dataclass
 class ZoneResult:
@@ -24,78 +55,63 @@ async def find_zone(
 ) -> ZoneResult | None:
     """Find the OMI zone containing a point, with fallback to nearest within 200m."""
 
-    # Exact match: point inside polygon
-    result = await db.execute(
-        text("""
-            SELECT z.link_zona, z.zone_code, z.fascia, z.municipality_name,
-                   z.zone_description
-            FROM omi.zones z
-            WHERE ST_Intersects(z.geom, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326))
-              AND z.semester = :semester
-            LIMIT 1
-        """),
-        {"lng": lng, "lat": lat, "semester": semester},
-    )
+    # One round trip for both cases: containing zone first, else the nearest one
+    # within 200m. The && box (0.003 deg is >200m everywhere in Italy) lets the
+    # GIST index narrow the candidates before the geography distance is computed.
+    result = await db.execute(_FIND_ZONE, {"lng": lng, "lat": lat, "semester": semester})
     row = result.first()
-    if row:
-        return ZoneResult(
-            link_zona=row.link_zona,
-            zone_code=row.zone_code,
-            fascia=row.fascia,
-            municipality_name=row.municipality_name,
-            zone_description=row.zone_description,
-        )
+    if not row:
+        return None
 
-    # Fallback: nearest zone within 200m
-    result = await db.execute(
-        text("""
-            SELECT z.link_zona, z.zone_code, z.fascia, z.municipality_name,
-                   z.zone_description,
-                   ST_Distance(
-                       z.geom::geography,
-                       ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography
-                   ) as dist_m
-            FROM omi.zones z
-            WHERE z.semester = :semester
-              AND ST_DWithin(
-                  z.geom::geography,
-                  ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography,
-                  200
-              )
-            ORDER BY dist_m
-            LIMIT 1
-        """),
-        {"lng": lng, "lat": lat, "semester": semester},
-    )
-    row = result.first()
-    if row:
+    if not row.inside:
         logger.info(
             f"No exact zone match for ({lat}, {lng}), using nearest at {row.dist_m:.0f}m"
         )
-        return ZoneResult(
-            link_zona=row.link_zona,
-            zone_code=row.zone_code,
-            fascia=row.fascia,
-            municipality_name=row.municipality_name,
-            zone_description=row.zone_description,
-            distance_m=row.dist_m,
-        )
-
-    return None
+    return ZoneResult(
+        link_zona=row.link_zona,
+        zone_code=row.zone_code,
+        fascia=row.fascia,
+        municipality_name=row.municipality_name,
+        zone_description=row.zone_description,
+        distance_m=None if row.inside else row.dist_m,
+    )
 
 
 async def get_latest_semester(db: AsyncSession) -> str | None:
     """Return the most recent semester available in the database."""
-    result = await db.execute(
-        text("SELECT DISTINCT semester FROM omi.zones ORDER BY semester DESC LIMIT 1")
-    )
-    row = result.first()
-    return row[0] if row else None
+    global _LATEST_SEMESTER_CACHE
+    cached = _LATEST_SEMESTER_CACHE
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    async with _SEMESTER_CACHE_LOCK:
+        # Another request may have refreshed the cache while we waited
+        cached = _LATEST_SEMESTER_CACHE
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        result = await db.execute(_LATEST_SEMESTER)
+        latest = result.scalar()
+        if not latest:
+            return None
+        _LATEST_SEMESTER_CACHE = (latest, time.monotonic() + SEMESTER_CACHE_TTL)
+        return latest
 
 
 async def get_all_semesters(db: AsyncSession) -> list[str]:
     """Return all available semesters, most recent first."""
-    result = await db.execute(
-        text("SELECT DISTINCT semester FROM omi.zones ORDER BY semester DESC")
-    )
-    return [row[0] for row in result]
+    global _ALL_SEMESTERS_CACHE
+    cached = _ALL_SEMESTERS_CACHE
+    if cached and cached[1] > time.monotonic():
+        return list(cached[0])
+
+    async with _SEMESTER_CACHE_LOCK:
+        cached = _ALL_SEMESTERS_CACHE
+        if cached and cached[1] > time.monotonic():
+            return list(cached[0])
+
+        result = await db.execute(_ALL_SEMESTERS)
+        semesters = [row[0] for row in result]
+        if semesters:
+            _ALL_SEMESTERS_CACHE = (semesters, time.monotonic() + SEMESTER_CACHE_TTL)
+        return list(semesters)
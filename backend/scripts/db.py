@@ -0,0 +1,72 @@
+"""Engine handling shared by the import scripts."""
+
+import logging
+from pathlib import Path
+
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Where a local Postgres puts its UNIX socket (Debian/Ubuntu, then the upstream default)
+PG_SOCKET_DIRS = ("/var/run/postgresql", "/tmp")
+_LOOPBACK_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+# One engine per URL per process, so helpers called with a plain URL share a pool
+_ENGINES: dict[str, Engine] = {}
+
+
+def as_engine(db: str | Engine) -> Engine:
+    """Return db if it is already an Engine, else this process's engine for the URL.
+
+    discover_and_import_all builds one engine and passes it down, so a full import
+    runs on a single connection pool; the functions still accept a plain URL when
+    called on their own. pool_pre_ping recycles connections that went stale while
+    a large CSV or KML batch was being parsed.
+    """
+    if isinstance(db, Engine):
+        return db
+    engine = _ENGINES.get(db)
+    if engine is None:
+        engine = _ENGINES[db] = create_engine(db, pool_pre_ping=True)
+    return engine
+
+
+def reset_after_fork() -> None:
+    """Process pool initializer: drop pooled connections inherited from the parent.
+
+    close=False leaves the parent's sockets alone; the child opens its own.
+    """
+    for engine in _ENGINES.values():
+        engine.dispose(close=False)
+
+
+def prefer_unix_socket(db_url: str) -> str:
+    """Return db_url rewritten to use the local UNIX socket when Postgres has one.
+
+    A loopback TCP URL is switched to the socket of the same port, which skips
+    the TCP stack on multi-GB COPY loads. The socket is only used if a test
+    connection succeeds (pg_hba.conf may authenticate "local" connections
+    differently); otherwise, and for remote hosts, db_url comes back unchanged.
+    """
+    url = make_url(db_url)
+    if url.host not in _LOOPBACK_HOSTS:
+        return db_url
+    port = url.port or 5432
+    for socket_dir in PG_SOCKET_DIRS:
+        if not (Path(socket_dir) / f".s.PGSQL.{port}").exists():
+            continue
+        socket_url = url.set(host=None).update_query_dict({"host": socket_dir})
+        probe = create_engine(socket_url)
+        try:
+            with probe.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except OperationalError as e:
+            logger.info(f"UNIX socket in {socket_dir} unusable, staying on TCP: {e}")
+            return db_url
+        finally:
+            probe.dispose()
+        logger.info(f"Connecting through the UNIX socket in {socket_dir}")
+        return socket_url.render_as_string(hide_password=False)
+    return db_url
@@ -10,6 +10,18 @@ Usage (from backend/):
     # Reset database (drop and recreate all OMI tables)
     python -m scripts.import_omi --reset
 
+    # Import semesters one at a time (default: one worker process per CPU)
+    python -m scripts.import_omi --workers 1
+
+    # VACUUM the tables afterwards, not just ANALYZE (e.g. after many re-imports)
+    python -m scripts.import_omi --vacuum
+
+    # Parse the KMLs with GDAL's LIBKML driver instead of lxml (needs the gdal extra)
+    python -m scripts.import_omi --gdal
+
+    # A localhost URL goes through the local UNIX socket when there is one; opt out
+    python -m scripts.import_omi --no-socket
+
     # Override via CLI args
     python -m scripts.import_omi [data_dir] [database_url]
 
@@ -19,20 +31,25 @@ Each zip contains:
 """
 
 import argparse
+import contextlib
 import logging
+import os
 import sys
 import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from zipfile import ZipFile
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import Engine, text
 
+from scripts.db import as_engine, prefer_unix_socket, reset_after_fork
 from scripts.import_omi_quotations import (
     import_quotations,
     import_zone_descriptions,
     parse_semester_from_filename,
 )
-from scripts.import_omi_zones import import_kml_zones_batch
+from scripts.import_omi_zones import import_kml_zones_batch, iter_kml_zip, prefetch
 
 logging.basicConfig(
     level=logging.INFO,
@@ -40,40 +57,101 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Zip central directories are read in parallel; the scan is I/O-bound
+ZIP_SCAN_WORKERS = 16
+
+# RAM-backed scratch space for extracted CSVs, when present (Linux)
+TMPFS_DIR = "/dev/shm"
+
+# Secondary indexes, dropped while an empty table is bulk loaded and rebuilt in one
+# pass afterwards. The UNIQUE keys stay (they guard the loads), and so does
+# idx_zones_semester, which answers the per-semester lookups made during the import
+DEFERRED_INDEXES = {
+    "omi.zones": ("omi.idx_zones_sem_geom", "omi.idx_zones_link"),
+    "omi.quotations": ("omi.idx_quot_covering", "omi.idx_quot_type"),
+}
+INDEX_BUILD_MEM = "1GB"
+
+# Indexes that replace older ones on existing databases: (name, CREATE, superseded).
+# They are built and the old ones dropped CONCURRENTLY, one statement at a time in
+# autocommit, so API reads and writes go on during the build; inside the schema
+# transaction the DROP's exclusive lock would block them until commit
+CONCURRENT_INDEXES = (
+    (
+        # Every spatial query also filters on semester: one GiST over both narrows to
+        # the semester's polygons inside the index instead of rechecking all semesters
+        "omi.idx_zones_sem_geom",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_zones_sem_geom"
+        " ON omi.zones USING GIST (semester, geom)",
+        "omi.idx_zones_geom",
+    ),
+    (
+        # Covers get_quotations (zone + semester + type) so it runs as an index-only
+        # scan; supersedes the (link_zona, semester) index, a prefix of the UNIQUE key
+        "omi.idx_quot_covering",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_quot_covering"
+        " ON omi.quotations (link_zona, semester, property_type_code)"
+        " INCLUDE (conservation_state, is_prevalent, property_type_desc, price_min, price_max,"
+        " surface_type_sale, rent_min, rent_max, surface_type_rent)",
+        "omi.idx_quot_lookup",
+    ),
+)
 
-def init_schema(db_url: str):
-    """Create the OMI schema and tables if they don't exist."""
-    schema_sql = (Path(__file__).parent.parent / "sql" / "001_schema.sql").read_text()
-    # Strip SQL comments (lines starting with --) to avoid splitting issues
-    lines = []
-    for line in schema_sql.splitlines():
-        # Remove inline comments but keep the rest of the line
-        comment_pos = line.find("--")
-        if comment_pos >= 0:
-            line = line[:comment_pos]
-        lines.append(line)
-    cleaned_sql = "\n".join(lines)
-
-    engine = create_engine(db_url)
-    for statement in cleaned_sql.split(";"):
-        stmt = statement.strip()
-        if not stmt:
-            continue
-        try:
-            with engine.begin() as conn:
-                conn.execute(text(stmt))
-        except Exception as e:
-            err_msg = str(e).lower()
-            if "already exists" in err_msg or "duplicate" in err_msg:
-                pass
-            else:
-                raise
+SCHEMA_PATH = Path(__file__).parent.parent / "sql" / "001_schema.sql"
+
+
+@lru_cache(maxsize=1)
+def _schema_sql() -> str:
+    """Return the schema DDL, read from disk once per process."""
+    return SCHEMA_PATH.read_text()
+
+
+def init_schema(db: str | Engine, maintenance_work_mem: str | None = None):
+    """Create the OMI schema and tables if they don't exist.
+
+    The DDL is idempotent (IF NOT EXISTS throughout), so the whole file is sent
+    as one multi-statement script in a single transaction; CONCURRENT_INDEXES follow
+    outside it. maintenance_work_mem, when given, is raised for both to speed up
+    index builds.
+    """
+    engine = as_engine(db)
+    with engine.begin() as conn:
+        if maintenance_work_mem:
+            conn.exec_driver_sql(f"SET LOCAL maintenance_work_mem = '{maintenance_work_mem}'")
+        conn.exec_driver_sql(_schema_sql())
+    _build_concurrent_indexes(engine, maintenance_work_mem)
     logger.info("Database schema initialized")
 
 
-def reset_schema(db_url: str):
+def _build_concurrent_indexes(engine: Engine, maintenance_work_mem: str | None = None):
+    """Create CONCURRENT_INDEXES and drop the indexes they supersede, without blocking reads.
+
+    A CONCURRENTLY build that failed leaves an INVALID index that IF NOT EXISTS would
+    keep; it is dropped and built again.
+    """
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        if maintenance_work_mem:
+            conn.exec_driver_sql(f"SET maintenance_work_mem = '{maintenance_work_mem}'")
+        try:
+            for name, create, superseded in CONCURRENT_INDEXES:
+                invalid = conn.execute(
+                    text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:n)"),
+                    {"n": name},
+                ).scalar()
+                if invalid:
+                    logger.warning(f"Rebuilding invalid index {name}")
+                    conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY {name}")
+                conn.exec_driver_sql(create)
+                conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {superseded}")
+        finally:
+            if maintenance_work_mem:
+                conn.exec_driver_sql("RESET maintenance_work_mem")
+
+
+def reset_schema(db: str | Engine):
     """Drop all OMI tables and recreate them from scratch."""
-    engine = create_engine(db_url)
+    engine = as_engine(db)
     with engine.begin() as conn:
         conn.execute(text("DROP TABLE IF EXISTS omi.quotations CASCADE"))
         conn.execute(text("DROP TABLE IF EXISTS omi.zones CASCADE"))
@@ -81,14 +159,13 @@ def reset_schema(db_url: str):
         conn.execute(text("DROP TABLE IF EXISTS omi.geocode_cache CASCADE"))
         conn.execute(text("DROP SCHEMA IF EXISTS omi CASCADE"))
     logger.info("Dropped all OMI tables and schema")
-    init_schema(db_url)
+    init_schema(engine)
 
 
-def get_existing_semesters(db_url: str) -> set[str]:
+def get_existing_semesters(db: str | Engine) -> set[str]:
     """Return semesters fully imported (present in both zones AND quotations)."""
-    engine = create_engine(db_url)
     try:
-        with engine.connect() as conn:
+        with as_engine(db).connect() as conn:
             zones = conn.execute(text("SELECT DISTINCT semester FROM omi.zones"))
             quots = conn.execute(text("SELECT DISTINCT semester FROM omi.quotations"))
             zone_sems = {row[0] for row in zones}
@@ -98,66 +175,66 @@ def get_existing_semesters(db_url: str) -> set[str]:
         return set()
 
 
-def discover_and_import_all(data_dir: str, db_url: str):
-    """Scan data_dir for all OMI zip files, extract, and import everything.
+def _detect_semester(zf: Path) -> tuple[ZipFile, str | None]:
+    """Return the open zip and its semester, from the first VALORI or ZONE CSV name inside.
 
-    This is the main entry point.
+    The zip is returned open so the import can reuse its parsed central directory;
+    the caller closes it.
     """
-    data_path = Path(data_dir)
-    zip_files = sorted(data_path.glob("*.zip"))
-    logger.info(f"Found {len(zip_files)} zip files in {data_dir}")
+    z = ZipFile(zf, "r")
+    for name in z.namelist():
+        sem = parse_semester_from_filename(name)
+        if sem:
+            return z, sem
+    return z, None
 
-    if not zip_files:
-        logger.error(f"No zip files found in {data_dir}")
-        sys.exit(1)
 
-    # Initialize schema
-    init_schema(db_url)
+def _scratch_dir(needed_bytes: int) -> str | None:
+    """Return /dev/shm when it is a RAM-backed mount with room for the extracted files.
 
-    # Check what's already imported
-    existing = get_existing_semesters(db_url)
-    if existing:
-        logger.info(f"Already imported semesters: {sorted(existing)}")
-
-    # Group zips by semester (detect from CSV filenames inside)
-    semester_zips: dict[str, list[Path]] = {}
-
-    for zf in zip_files:
-        with ZipFile(zf, "r") as z:
-            names = z.namelist()
-            # Find a VALORI or ZONE CSV to determine semester
-            for name in names:
-                sem = parse_semester_from_filename(name)
-                if sem:
-                    semester_zips.setdefault(sem, []).append(zf)
-                    break
-            else:
-                logger.warning(f"Could not determine semester for {zf.name} -- skipping")
-
-    logger.info(f"Detected semesters: {sorted(semester_zips.keys())}")
-
-    # Import each semester
-    for semester in sorted(semester_zips.keys()):
-        if semester in existing:
-            logger.info(f"Semester {semester} already imported -- skipping")
-            continue
-
-        zips = semester_zips[semester]
-        # Use the first zip that contains this semester (duplicates have same data)
-        zip_path = zips[0]
-        if len(zips) > 1:
-            logger.info(
-                f"Semester {semester} found in {len(zips)} zips, using {zip_path.name}"
-            )
-
-        logger.info(f"\n{'='*60}")
-        logger.info(f"IMPORTING SEMESTER {semester} from {zip_path.name}")
-        logger.info(f"{'='*60}")
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            logger.info(f"Extracting {zip_path.name} to temp directory...")
-            with ZipFile(zip_path, "r") as z:
-                z.extractall(tmpdir)
+    Extracted CSVs are read once and deleted, so there is no point writing them to
+    disk. Falls back to the default temp dir (None) when there is no tmpfs or it
+    has less than twice the space needed.
+    """
+    try:
+        st = os.statvfs(TMPFS_DIR)
+    except OSError:
+        return None
+    if st.f_bavail * st.f_frsize < 2 * needed_bytes:
+        return None
+    return TMPFS_DIR
+
+
+def _import_semester(
+    zip_src: Path | ZipFile,
+    semester: str,
+    db: str | Engine,
+    parse_workers: int = 1,
+    use_gdal: bool = False,
+):
+    """Import one semester (ZONE CSV, KML perimeters, VALORI CSV) from its zip.
+
+    zip_src is the zip already opened by the semester scan (serial imports) or its
+    path. Runs in a worker process when semesters are imported in parallel; db is
+    then a URL and the worker reuses one engine for every semester it is given.
+    parse_workers processes parse the KMLs, with GDAL when use_gdal is set.
+    """
+    engine = as_engine(db)
+    zip_path = Path(zip_src.filename) if isinstance(zip_src, ZipFile) else zip_src
+    logger.info(f"\n{'='*60}")
+    logger.info(f"IMPORTING SEMESTER {semester} from {zip_path.name}")
+    logger.info(f"{'='*60}")
+
+    # KMLs (~7,900 per semester) are streamed from the archive; only the two
+    # CSVs are extracted, since they are parsed by path
+    with zip_src if isinstance(zip_src, ZipFile) else ZipFile(zip_path, "r") as z:
+        names = z.namelist()
+        csv_infos = [i for i in z.infolist() if i.filename.lower().endswith(".csv")]
+        scratch = _scratch_dir(sum(i.file_size for i in csv_infos))
+        with tempfile.TemporaryDirectory(dir=scratch) as tmpdir:
+            logger.info(f"Extracting {len(csv_infos)} CSVs from {zip_path.name} to {tmpdir}...")
+            for info in csv_infos:
+                z.extract(info, tmpdir)
 
             tmppath = Path(tmpdir)
 
@@ -170,15 +247,19 @@ def discover_and_import_all(data_dir: str, db_url: str):
             if zone_csvs:
                 zone_csv = zone_csvs[0]
                 logger.info(f"Parsing zone descriptions from {zone_csv.name}")
-                zone_lookup = import_zone_descriptions(str(zone_csv), semester, db_url)
+                zone_lookup = import_zone_descriptions(str(zone_csv), semester, engine)
             else:
                 logger.warning(f"No ZONE CSV found for {semester}")
 
             # 2. Import KML polygons (zones must exist before quotations due to FK)
-            kml_files = list(tmppath.glob("*.kml"))
-            if kml_files:
-                logger.info(f"Importing {len(kml_files)} KML zone perimeters...")
-                import_kml_zones_batch(tmpdir, semester, zone_lookup, db_url)
+            kml_count = sum(1 for n in names if n.lower().endswith(".kml"))
+            if kml_count:
+                logger.info(f"Importing {kml_count} KML zone perimeters...")
+                # Members are decompressed on a reader thread while batches are COPYed
+                import_kml_zones_batch(
+                    prefetch(iter_kml_zip(z)), semester, zone_lookup, engine,
+                    parse_workers=parse_workers, use_gdal=use_gdal,
+                )
             else:
                 logger.warning(f"No KML files found for {semester}")
 
@@ -189,17 +270,140 @@ def discover_and_import_all(data_dir: str, db_url: str):
             if valori_csvs:
                 valori_csv = valori_csvs[0]
                 logger.info(f"Importing quotations from {valori_csv.name}")
-                import_quotations(str(valori_csv), semester, db_url)
+                import_quotations(str(valori_csv), semester, engine)
             else:
                 logger.warning(f"No VALORI CSV found for {semester}")
 
-    # Post-import maintenance
-    logger.info("\nRunning VACUUM ANALYZE...")
-    engine = create_engine(db_url)
+
+def discover_and_import_all(
+    data_dir: str,
+    db: str | Engine,
+    workers: int | None = None,
+    vacuum: bool = False,
+    use_gdal: bool = False,
+):
+    """Scan data_dir for all OMI zip files, extract, and import everything.
+
+    This is the main entry point. db is a connection string or an Engine; the
+    serial steps share the one engine. workers caps the number of semesters imported
+    in parallel (default: one per CPU; 1 imports them in this process); when only
+    one semester is pending they parse its KMLs instead. vacuum runs
+    VACUUM ANALYZE on the tables afterwards instead of just ANALYZE. use_gdal parses
+    the KMLs with GDAL instead of lxml.
+    """
+    data_path = Path(data_dir)
+    zip_files = sorted(data_path.glob("*.zip"))
+    logger.info(f"Found {len(zip_files)} zip files in {data_dir}")
+
+    if not zip_files:
+        logger.error(f"No zip files found in {data_dir}")
+        sys.exit(1)
+
+    engine = as_engine(db)
+
+    # Initialize schema
+    init_schema(engine)
+
+    # Check what's already imported
+    existing = get_existing_semesters(engine)
+    if existing:
+        logger.info(f"Already imported semesters: {sorted(existing)}")
+
+    # Group zips by semester (detect from CSV filenames inside). The zips stay open
+    # until the end of the run, so a serial import reuses the central directory the
+    # scan already parsed instead of reading it a second time
+    semester_zips: dict[str, list[ZipFile]] = {}
+    open_zips = contextlib.ExitStack()
+
+    with ThreadPoolExecutor(max_workers=ZIP_SCAN_WORKERS) as ex:
+        # map() keeps zip_files order, so the "first zip per semester" choice is stable
+        for z, sem in ex.map(_detect_semester, zip_files):
+            open_zips.enter_context(z)
+            if sem:
+                semester_zips.setdefault(sem, []).append(z)
+            else:
+                logger.warning(
+                    f"Could not determine semester for {Path(z.filename).name} -- skipping"
+                )
+
+    logger.info(f"Detected semesters: {sorted(semester_zips.keys())}")
+
+    # Import each pending semester. Semesters are independent (separate zips, rows
+    # keyed by semester), so they can run side by side in worker processes
+    pending = []
+    for semester in sorted(semester_zips.keys()):
+        if semester in existing:
+            logger.info(f"Semester {semester} already imported -- skipping")
+            continue
+
+        zips = semester_zips[semester]
+        # Use the first zip that contains this semester (duplicates have same data)
+        z = zips[0]
+        if len(zips) > 1:
+            logger.info(
+                f"Semester {semester} found in {len(zips)} zips, "
+                f"using {Path(z.filename).name}"
+            )
+        pending.append((z, semester))
+
+    # On an empty table (first import, --reset) building the secondary indexes once at
+    # the end beats updating them row by row through every COPY; for the zones' GiST
+    # index the bulk build is far cheaper still. If the run dies midway, the next
+    # one's init_schema recreates them
+    deferred = []
+    if pending:
+        with engine.begin() as conn:
+            for table, indexes in DEFERRED_INDEXES.items():
+                if conn.execute(text(f"SELECT NOT EXISTS (SELECT 1 FROM {table})")).scalar():
+                    logger.info(f"Empty {table}: deferring {', '.join(indexes)}")
+                    for index in indexes:
+                        conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+                    deferred.extend(indexes)
+
+    cpus = workers or os.cpu_count() or 1
+    workers = min(cpus, len(pending))
+    with open_zips:
+        if workers <= 1:
+            # One semester at a time (e.g. the usual one new semester): spend the
+            # CPUs on parsing its KMLs instead
+            for z, semester in pending:
+                _import_semester(z, semester, engine, parse_workers=cpus, use_gdal=use_gdal)
+        else:
+            logger.info(f"Importing {len(pending)} semesters with {workers} worker processes")
+            # Engines and open files do not survive pickling; workers get the URL and
+            # the zip path, and open both themselves
+            open_zips.close()
+            db_url = engine.url.render_as_string(hide_password=False)
+            with ProcessPoolExecutor(max_workers=workers, initializer=reset_after_fork) as pool:
+                futures = {
+                    pool.submit(
+                        _import_semester, Path(z.filename), semester, db_url,
+                        use_gdal=use_gdal,
+                    ): semester
+                    for z, semester in pending
+                }
+                for fut in as_completed(futures):
+                    fut.result()
+                    logger.info(f"Semester {futures[fut]} done")
+
+    if deferred:
+        logger.info(f"Rebuilding deferred indexes {', '.join(deferred)}...")
+        init_schema(engine, maintenance_work_mem=INDEX_BUILD_MEM)
+
+    # Post-import maintenance. The load is append-mostly, so there is little for VACUUM
+    # to reclaim; fresh planner stats are what matter, and autovacuum catches up
+    # on the inserted pages later. Only a re-imported semester leaves dead rows
+    maintenance = "VACUUM ANALYZE" if vacuum else "ANALYZE"
+    logger.info(f"\nRunning {maintenance}...")
     with engine.connect() as conn:
         conn.execution_options(isolation_level="AUTOCOMMIT")
-        conn.execute(text("VACUUM ANALYZE omi.zones"))
-        conn.execute(text("VACUUM ANALYZE omi.quotations"))
+        conn.execute(text(f"{maintenance} omi.zones"))
+        conn.execute(text(f"{maintenance} omi.quotations"))
+        # CONCURRENTLY keeps the map endpoints readable during the refresh
+        logger.info("Refreshing omi.zone_prevalent_20 and omi.zone_semesters...")
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY omi.zone_prevalent_20"))
+        conn.execute(text("ANALYZE omi.zone_prevalent_20"))
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY omi.zone_semesters"))
 
     logger.info("\nImport complete!")
 
@@ -211,13 +415,22 @@ def main():
     parser.add_argument("data_dir", nargs="?", default=settings.data_dir, help="Directory containing OMI zip files")
     parser.add_argument("database_url", nargs="?", default=settings.database_url, help="PostgreSQL connection string")
     parser.add_argument("--reset", action="store_true", help="Drop and recreate all OMI tables before importing")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes: semesters in parallel, or one semester's KML parsing (default: CPU count)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM ANALYZE the tables after importing (default: ANALYZE only)")
+    parser.add_argument("--no-socket", action="store_true", help="Keep a localhost URL on TCP instead of the local UNIX socket")
+    parser.add_argument("--gdal", action="store_true", help="Parse KMLs with GDAL's LIBKML driver instead of lxml (needs the gdal extra)")
     args = parser.parse_args()
 
-    if args.reset:
-        logger.info("Resetting database (dropping all OMI tables)...")
-        reset_schema(args.database_url)
+    db_url = args.database_url if args.no_socket else prefer_unix_socket(args.database_url)
+    engine = as_engine(db_url)
+    try:
+        if args.reset:
+            logger.info("Resetting database (dropping all OMI tables)...")
+            reset_schema(engine)
 
-    discover_and_import_all(args.data_dir, args.database_url)
+        discover_and_import_all(args.data_dir, engine, args.workers, args.vacuum, args.gdal)
+    finally:
+        engine.dispose()
 
 
 if __name__ == "__main__":
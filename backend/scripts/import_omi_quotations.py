@@ -12,10 +12,30 @@ import re
 from pathlib import Path
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pacsv
+from sqlalchemy import Engine
+
+from scripts.db import as_engine
 
 logger = logging.getLogger(__name__)
 
+# Arrow splits the CSV at line boundaries into blocks of this size and parses them
+# on its thread pool. A VALORI file is a few tens of MB, so 8 MB blocks keep every
+# core busy where 32 MB would give two or three blocks in total
+CSV_BLOCK_SIZE = 8 << 20
+
+# Rows per COPY write when streaming the cleaned table to Postgres
+COPY_BATCH_ROWS = 50_000
+_COPY_CSV_OPTIONS = pacsv.WriteOptions(include_header=False, quoting_style="needed")
+
+_FLOAT_RE = r"^[+-]?\d+(\.\d+)?$"
+_INT_RE = r"^[+-]?\d+$"
+# 2 uppercase letters + 8 digits
+_LINK_ZONA_RE = r"^[A-Z]{2}\d{8}$"
+_CONTROL_CHARS_RE = r"[\t\n\r]"
+
 
 def parse_semester_from_filename(filename: str) -> str | None:
     """Extract semester from OMI CSV filename.
@@ -30,80 +50,138 @@ def parse_semester_from_filename(filename: str) -> str | None:
     return None
 
 
-def import_quotations(csv_path: str, semester: str, db_url: str) -> int:
+def _skip_bad_row(row) -> str:
+    logger.warning(f"Skipping malformed CSV line {row.number}: {row.text!r}")
+    return "skip"
+
+
+def _read_omi_csv(csv_path: str) -> pa.Table:
+    """Read an OMI CSV into an Arrow table of trimmed string columns.
+
+    Line 1 is a descriptive title, line 2 the ';'-separated header. Tries UTF-8,
+    then latin-1. Empty fields become null; nothing else does (pandas' default NA
+    strings would also null out "NA", Napoli's province code).
+    """
+    for encoding in ("utf-8", "latin-1"):
+        try:
+            with open(csv_path, "rb") as f:
+                f.readline()
+                header = f.readline().decode(encoding)
+            names = [c.strip() for c in header.rstrip("\r\n").split(";")]
+            table = pacsv.read_csv(
+                csv_path,
+                read_options=pacsv.ReadOptions(
+                    skip_rows=2, column_names=names, encoding=encoding,
+                    block_size=CSV_BLOCK_SIZE, use_threads=True,
+                ),
+                parse_options=pacsv.ParseOptions(
+                    delimiter=";", invalid_row_handler=_skip_bad_row
+                ),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={c: pa.string() for c in names},
+                    strings_can_be_null=True,
+                    null_values=[""],
+                ),
+            )
+            break
+        except (UnicodeDecodeError, pa.ArrowInvalid):
+            if encoding != "utf-8":
+                raise
+            logger.warning(f"UTF-8 decode failed for {csv_path}, falling back to latin-1")
+
+    # Drop the trailing empty column from the trailing semicolon
+    if table.column_names and table.column_names[-1] == "":
+        table = table.drop_columns([""])
+
+    # Strip whitespace from all values; fields left empty become null
+    for i, col in enumerate(table.columns):
+        trimmed = pc.utf8_trim_whitespace(col)
+        cleaned = pc.if_else(pc.equal(trimmed, ""), pa.scalar(None, pa.string()), trimmed)
+        table = table.set_column(i, table.column_names[i], cleaned)
+    return table
+
+
+def _to_number(col: pa.ChunkedArray, pattern: str, type_: pa.DataType) -> pa.ChunkedArray:
+    """Cast strings matching pattern to type_; anything else becomes null (errors="coerce")."""
+    valid = pc.match_substring_regex(col, pattern)
+    return pc.cast(pc.if_else(valid, col, pa.scalar(None, pa.string())), type_)
+
+
+def _flatten_control_chars(table: pa.Table) -> pa.Table:
+    """Replace embedded tabs/newlines in text columns with spaces (nulls stay null).
+
+    One vectorized scan per column; only columns that contain such a character
+    pay for the replace.
+    """
+    for i, field in enumerate(table.schema):
+        if not (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            continue
+        col = table.column(i)
+        if pc.any(pc.match_substring_regex(col, _CONTROL_CHARS_RE)).as_py():
+            table = table.set_column(
+                i, field, pc.replace_substring_regex(col, _CONTROL_CHARS_RE, " ")
+            )
+    return table
+
+
+def import_quotations(csv_path: str, semester: str, db: str | Engine) -> int:
     """Import a single OMI quotation CSV into the database.
 
     Args:
         csv_path: Path to the semicolon-delimited CSV file.
         semester: Semester string, e.g. "2024_S2".
-        db_url: PostgreSQL connection string.
+        db: PostgreSQL connection string or Engine.
 
     Returns:
         Number of rows imported.
     """
     logger.info(f"Reading {csv_path} for semester {semester}")
 
-    # Read CSV: skip line 1 (descriptive title), use line 2 as headers
-    try:
-        df = pd.read_csv(
-            csv_path, sep=";", encoding="utf-8", dtype=str,
-            skiprows=1, on_bad_lines="warn",
-        )
-    except UnicodeDecodeError:
-        logger.warning(f"UTF-8 decode failed for {csv_path}, falling back to latin-1")
-        df = pd.read_csv(
-            csv_path, sep=";", encoding="latin-1", dtype=str,
-            skiprows=1, on_bad_lines="warn",
-        )
-
-    if df.empty:
+    table = _read_omi_csv(csv_path)
+    if table.num_rows == 0:
         logger.warning(f"Empty CSV: {csv_path}")
         return 0
 
-    # Strip whitespace from column names and all string values
-    df.columns = df.columns.str.strip()
-    for col in df.columns:
-        if df[col].dtype == object:
-            df[col] = df[col].str.strip()
-
-    # Drop the trailing empty column from the trailing semicolon
-    if df.columns[-1] == "" or df.columns[-1].startswith("Unnamed"):
-        df = df.iloc[:, :-1]
+    # Validate LinkZona format first, so the conversions below skip rejected rows.
+    # RE2 matches the anchored pattern in one linear pass over the column, with no
+    # per-cell Python call or backtracking
+    if "LinkZona" in table.column_names:
+        valid_lz = pc.fill_null(pc.match_substring_regex(table["LinkZona"], _LINK_ZONA_RE), False)
+        invalid_count = len(valid_lz) - pc.sum(valid_lz).as_py()
+        if invalid_count > 0:
+            bad = pc.drop_null(pc.filter(table["LinkZona"], pc.invert(valid_lz)))
+            bad_samples = pc.unique(bad)[:5].to_pylist()
+            logger.warning(
+                f"{invalid_count} rows with invalid LinkZona in {csv_path}: {bad_samples}"
+            )
+            # Keep only valid rows
+            table = table.filter(valid_lz)
 
     # Numeric conversions: replace comma decimal separator with period
-    numeric_cols = ["Compr_min", "Compr_max", "Loc_min", "Loc_max"]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = (
-                df[col]
-                .str.replace(",", ".", regex=False)
-                .apply(pd.to_numeric, errors="coerce")
+    for col in ("Compr_min", "Compr_max", "Loc_min", "Loc_max"):
+        if col in table.column_names:
+            values = pc.replace_substring(table[col], ",", ".")
+            table = table.set_column(
+                table.schema.get_field_index(col), col, _to_number(values, _FLOAT_RE, pa.float64())
             )
 
-    # Property type code -- use nullable Int64 so COPY writes "20" not "20.0"
-    if "Cod_Tip" in df.columns:
-        df["Cod_Tip"] = pd.to_numeric(df["Cod_Tip"], errors="coerce").astype("Int64")
+    # Property type code -- converted to nullable Int64 so COPY writes "20" not "20.0"
+    if "Cod_Tip" in table.column_names:
+        table = table.set_column(
+            table.schema.get_field_index("Cod_Tip"), "Cod_Tip",
+            _to_number(table["Cod_Tip"], _INT_RE, pa.int64()),
+        )
+
+    df = table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
 
     # Prevalent state: "P" -> True, anything else -> False
     if "Stato_prev" in df.columns:
-        df["is_prevalent"] = df["Stato_prev"].str.strip().str.upper() == "P"
+        df["is_prevalent"] = df["Stato_prev"].str.upper() == "P"
     else:
         df["is_prevalent"] = False
 
     df["semester"] = semester
 
-    # Validate LinkZona format: 2 uppercase letters + 8 digits
-    if "LinkZona" in df.columns:
-        valid_lz = df["LinkZona"].str.match(r"^[A-Z]{2}\d{8}$", na=False)
-        invalid_count = (~valid_lz).sum()
-        if invalid_count > 0:
-            bad_samples = df.loc[~valid_lz, "LinkZona"].dropna().unique()[:5]
-            logger.warning(
-                f"{invalid_count} rows with invalid LinkZona in {csv_path}: {bad_samples}"
-            )
-            # Keep only valid rows
-            df = df[valid_lz]
-
     # Rename columns to match database schema
     result = df.rename(
         columns={
@@ -141,7 +219,9 @@ def import_quotations(csv_path: str, semester: str, db_url: str) -> int:
         "surface_type_rent",
     ]
 
-    output = result[db_cols].copy()
+    # Selecting columns already yields a new frame, and drop_duplicates another, so
+    # no defensive .copy() is needed
+    output = result[db_cols]
 
     # Deduplicate on UNIQUE key (some CSVs have duplicate rows)
     unique_key = ["link_zona", "semester", "property_type_code", "conservation_state"]
@@ -150,41 +230,33 @@ def import_quotations(csv_path: str, semester: str, db_url: str) -> int:
     if len(output) < before:
         logger.info(f"Dropped {before - len(output)} duplicate rows for {semester}")
 
-    # Fix data types for PostgreSQL COPY text format
-    # Boolean: COPY expects t/f, not True/False
-    output["is_prevalent"] = output["is_prevalent"].map({True: "t", False: "f"})
-    # Replace empty strings with None so they become \N (NULL) in COPY
-    for col in output.select_dtypes(include="object").columns:
-        output[col] = output[col].replace("", None)
-        # Sanitize embedded tabs/newlines that would corrupt TSV
-        output[col] = output[col].str.replace(r"[\t\n\r]", " ", regex=True)
-
     # Use PostgreSQL COPY for bulk loading (no parameter limits, fastest method)
-    engine = create_engine(db_url)
-
-    # Delete any existing data for this semester (safe re-import on retry)
-    with engine.begin() as conn:
-        deleted = conn.execute(
-            text("DELETE FROM omi.quotations WHERE semester = :sem"),
-            {"sem": semester},
-        )
-        if deleted.rowcount > 0:
-            logger.info(f"Deleted {deleted.rowcount} existing rows for {semester}")
+    engine = as_engine(db)
 
     raw_conn = engine.raw_connection()
     try:
         cursor = raw_conn.cursor()
-        buf = io.StringIO()
-        output.to_csv(buf, sep="\t", header=False, index=False, na_rep="\\N")
-        buf.seek(0)
+        # A lost commit on crash only means re-running the import, so don't wait on the WAL flush
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        # Delete any existing data for this semester (safe re-import on retry). It shares
+        # the COPY's transaction: one commit round trip, and a failed load keeps the old rows.
+        # (psycopg's pipeline mode would not help here: it refuses COPY.)
+        cursor.execute("DELETE FROM omi.quotations WHERE semester = %s", (semester,))
+        if cursor.rowcount > 0:
+            logger.info(f"Deleted {cursor.rowcount} existing rows for {semester}")
+        # Stream record batches, each rendered by Arrow as CSV (strings quoted, NULL
+        # as an unquoted empty field), so no full-size text copy of the data is built
+        table = _flatten_control_chars(pa.Table.from_pandas(output, preserve_index=False))
         with cursor.copy(
             "COPY omi.quotations (link_zona, semester, property_type_code,"
             " property_type_desc, conservation_state, is_prevalent,"
             " price_min, price_max, surface_type_sale,"
-            " rent_min, rent_max, surface_type_rent) FROM STDIN"
+            " rent_min, rent_max, surface_type_rent) FROM STDIN WITH (FORMAT csv)"
         ) as copy:
-            while data := buf.read(8192):
-                copy.write(data.encode("utf-8"))
+            for batch in table.to_batches(max_chunksize=COPY_BATCH_ROWS):
+                buf = io.BytesIO()
+                pacsv.write_csv(batch, buf, _COPY_CSV_OPTIONS)
+                copy.write(buf.getbuffer())
         raw_conn.commit()
         total = len(output)
     except Exception as e:
@@ -201,7 +273,7 @@ def import_quotations(csv_path: str, semester: str, db_url: str) -> int:
     return total
 
 
-def import_zone_descriptions(csv_path: str, semester: str, db_url: str) -> dict:
+def import_zone_descriptions(csv_path: str, semester: str, db: str | Engine) -> dict:
     """Import ZONE CSV and return a lookup dict: (belfiore_code, zone_code) -> {link_zona, ...}.
 
     This is used by the KML importer to resolve LinkZona from CODCOM + CODZONA.
@@ -211,46 +283,36 @@ def import_zone_descriptions(csv_path: str, semester: str, db_url: str) -> dict:
     """
     logger.info(f"Reading zone descriptions from {csv_path} for semester {semester}")
 
-    try:
-        df = pd.read_csv(
-            csv_path, sep=";", encoding="utf-8", dtype=str,
-            skiprows=1, on_bad_lines="warn",
-        )
-    except UnicodeDecodeError:
-        logger.warning(f"UTF-8 decode failed for {csv_path}, falling back to latin-1")
-        df = pd.read_csv(
-            csv_path, sep=";", encoding="latin-1", dtype=str,
-            skiprows=1, on_bad_lines="warn",
-        )
-
-    if df.empty:
+    table = _read_omi_csv(csv_path)
+    if table.num_rows == 0:
         return {}
 
-    df.columns = df.columns.str.strip()
-    for col in df.columns:
-        if df[col].dtype == object:
-            df[col] = df[col].str.strip()
-
-    # Drop trailing empty column
-    if df.columns[-1] == "" or df.columns[-1].startswith("Unnamed"):
-        df = df.iloc[:, :-1]
-
     # Clean Zona_Descr: strip spurious single quotes
-    if "Zona_Descr" in df.columns:
-        df["Zona_Descr"] = df["Zona_Descr"].str.strip("'").str.strip()
+    if "Zona_Descr" in table.column_names:
+        descr = pc.utf8_trim_whitespace(pc.utf8_trim(table["Zona_Descr"], "'"))
+        table = table.set_column(table.schema.get_field_index("Zona_Descr"), "Zona_Descr", descr)
+
+    # Build lookup: (Comune_amm, Zona) -> row data, zipping whole columns as Python
+    # lists rather than boxing every row into a Series
+    def column(name: str) -> list:
+        if name in table.column_names:
+            return table[name].to_pylist()
+        return [""] * table.num_rows
 
-    # Build lookup: (Comune_amm, Zona) -> row data
     lookup = {}
-    for _, row in df.iterrows():
-        key = (row.get("Comune_amm", ""), row.get("Zona", ""))
-        lookup[key] = {
-            "link_zona": row.get("LinkZona", ""),
-            "province_code": row.get("Prov", ""),
-            "municipality_istat": row.get("Comune_ISTAT", ""),
-            "municipality_name": row.get("Comune_descrizione", ""),
-            "fascia": row.get("Fascia", ""),
-            "zone_code": row.get("Zona", ""),
-            "zone_description": row.get("Zona_Descr", ""),
+    for comune_amm, zona, link_zona, prov, istat, name, fascia, descr in zip(
+        column("Comune_amm"), column("Zona"), column("LinkZona"), column("Prov"),
+        column("Comune_ISTAT"), column("Comune_descrizione"), column("Fascia"),
+        column("Zona_Descr"),
+    ):
+        lookup[(comune_amm, zona)] = {
+            "link_zona": link_zona,
+            "province_code": prov,
+            "municipality_istat": istat,
+            "municipality_name": name,
+            "fascia": fascia,
+            "zone_code": zona,
+            "zone_description": descr,
         }
 
     logger.info(f"Built zone lookup with {len(lookup)} entries for {semester}")
@@ -7,19 +7,74 @@ LINKZONA is empty in the KMLs, so we construct it by looking up the ZONE CSV
 via (CODCOM, CODZONA) -> LinkZona.
 """
 
+import io
 import logging
+import multiprocessing
+import queue
 import re
+import threading
+import uuid
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from zipfile import ZipFile
 
+import numpy as np
+import shapely
 from lxml import etree
 from shapely.geometry import MultiPolygon, Polygon
-from shapely import wkt
-from sqlalchemy import create_engine, text
+from sqlalchemy import Engine, text
+
+from scripts.db import as_engine, reset_after_fork
+
+try:
+    from osgeo import gdal, ogr
+except ImportError:
+    gdal = ogr = None
 
 logger = logging.getLogger(__name__)
 
 KML_NS = {"kml": "http://www.opengis.net/kml/2.2"}
 
+_PLACEMARK_TAG = "{http://www.opengis.net/kml/2.2}Placemark"
+
+# 2 uppercase letters + 8 digits
+_LINK_ZONA_RE = re.compile(r"[A-Z]{2}\d{8}")
+_ZONE_NAME_RE = re.compile(r"Zona\s+OMI\s+(\S+)")
+_KML_SEMESTER_RE = re.compile(rb"Anno/Semestre\s+(\d{4})/(\d)")
+# The Document <name> comes right after the XML prolog, within the first few hundred bytes
+KML_HEADER_BYTES = 1024
+
+# KMLs need none of xml:id collection, entities, comments or PIs; skipping them trims
+# the parser's per-node work (and entity expansion). huge_tree admits the very long
+# <coordinates> text nodes of detailed polygons
+_KML_PARSE_OPTIONS = dict(
+    collect_ids=False, resolve_entities=False, remove_comments=True, remove_pis=True,
+    huge_tree=True,
+)
+
+# Compiled once: each call is a single C-level traversal with no tag-string parsing
+_DATA = etree.XPath(".//kml:Data", namespaces=KML_NS)
+_VALUE_TEXT = etree.XPath("kml:value/text()", namespaces=KML_NS)
+_NAME_TEXT = etree.XPath("kml:name/text()", namespaces=KML_NS)
+_COORDINATES_TEXT = etree.XPath(".//kml:coordinates/text()", namespaces=KML_NS)
+
+# KML members decompressed ahead of the parser by prefetch() (a few MB at most)
+KML_PREFETCH = 32
+
+# KMLs queued per parse worker, so the pool never pulls a whole zip into memory
+KML_PARSE_BACKLOG = 4
+
+# Zones per COPY batch. COPY has no bind-parameter cap (the 65535 limit is for the
+# placeholders of one statement), so the batch is sized by per-batch overhead: a temp
+# table, an INSERT ... SELECT and a commit each. Larger batches amortize that until
+# the staged WKB (a few KB per zone) and the bisection retries of a bad batch grow
+ZONE_BATCH_SIZE = 5000
+
+# Batches queued for the writer thread while the next ones are parsed
+ZONE_WRITE_BACKLOG = 2
+
 
 def parse_semester_from_kml(kml_path: str) -> str | None:
     """Extract semester from KML Document name element.
@@ -28,16 +83,14 @@ def parse_semester_from_kml(kml_path: str) -> str | None:
     Returns: "2025_S1" or None.
     """
     try:
-        # Only parse the first few KB to find the Document name
+        # Only scan the start of the file, where the Document name sits
         with open(kml_path, "rb") as f:
-            # Read enough to get the Document name
-            header = f.read(2048)
+            header = f.read(KML_HEADER_BYTES)
 
-        match = re.search(rb"Anno/Semestre\s+(\d{4})/(\d)", header)
+        match = _KML_SEMESTER_RE.search(header)
         if match:
-            year = match.group(1).decode()
-            sem = match.group(2).decode()
-            return f"{year}_S{sem}"
+            # Digits only, so the bytes decode as ASCII
+            return match.expand(rb"\1_S\2").decode("ascii")
     except Exception as e:
         logger.warning(f"Could not parse semester from {kml_path}: {e}")
 
@@ -53,298 +106,608 @@ def parse_kml_placemarks(kml_path: str) -> list[dict]:
     - 2014_S2+: CODCOM + CODZONA present, LINKZONA empty
 
     Returns a list of dicts with keys:
-        codcom, codzona, link_zona, geometry (Shapely MultiPolygon)
+        codcom, codzona, link_zona, geometry (Shapely Polygon, or MultiPolygon for several rings)
+    """
+    return list(parse_kml_bytes(Path(kml_path).read_bytes(), kml_path))
+
+
+def parse_kml_bytes(
+    raw: bytes, kml_name: str, wanted: dict[str, frozenset[str]] | None = None
+) -> Iterator[dict]:
+    """Yield the zones of KML content already in memory; see parse_kml_placemarks.
+
+    kml_name is the file name or zip member name (its stem is the Belfiore code).
+    Placemarks are parsed one at a time and freed once read, so a large file never
+    sits in memory as a whole DOM. wanted maps codcom to the codzona values the
+    caller can resolve; a placemark outside it (and without a valid LINKZONA) is
+    yielded with geometry None, its coordinates never parsed.
     """
     # Belfiore code from filename (e.g., A181.kml -> A181)
-    filename_codcom = Path(kml_path).stem
+    filename_codcom = Path(kml_name).stem
 
-    # Read as bytes and handle encoding issues (some KMLs have non-UTF-8 chars)
-    raw = Path(kml_path).read_bytes()
+    # Handle encoding issues (some KMLs have non-UTF-8 chars). The error can surface
+    # midway through the stream, so the retry skips zones that were already yielded
+    done = 0
     try:
-        tree = etree.fromstring(raw)
+        for zone in _iter_placemarks(raw, filename_codcom, wanted):
+            done += 1
+            yield zone
+        return
     except etree.XMLSyntaxError:
-        # Fallback: decode with replacement, then re-parse
-        decoded = raw.decode("utf-8", errors="replace").encode("utf-8")
-        try:
-            tree = etree.fromstring(decoded)
-        except etree.XMLSyntaxError as e:
-            logger.warning(f"Cannot parse KML {kml_path}: {e}")
-            return []
-    root = tree
-
-    zones = []
-    for pm in root.iter("{http://www.opengis.net/kml/2.2}Placemark"):
-        data = {}
-
-        # Extract ExtendedData fields
-        for data_el in pm.iter("{http://www.opengis.net/kml/2.2}Data"):
-            name = data_el.get("name", "")
-            value_el = data_el.find("{http://www.opengis.net/kml/2.2}value")
-            if value_el is not None and value_el.text:
-                data[name] = value_el.text.strip()
-
-        codcom = data.get("CODCOM", "")
-        codzona = data.get("CODZONA", "")
-        link_zona = data.get("LINKZONA", "")
-
-        # Three KML formats:
-        # 1. LINKZONA populated directly (2010, 2013)
-        # 2. CODCOM + CODZONA (2014_S2+)
-        # 3. Neither — extract codcom from filename, codzona from <name> tag (2014_S1)
-        if not codcom and not codzona and not link_zona:
-            # Try to extract zone code from <name>: "CITY - Zona OMI R1"
-            name_el = pm.find("{http://www.opengis.net/kml/2.2}name")
-            if name_el is not None and name_el.text:
-                zone_match = re.search(r"Zona\s+OMI\s+(\S+)", name_el.text)
-                if zone_match:
-                    codcom = filename_codcom
-                    codzona = zone_match.group(1)
-                else:
-                    continue
-            else:
-                continue
+        pass
 
-        # Parse all polygons (may be inside MultiGeometry or direct)
-        polygons = []
-        for coords_el in pm.iter("{http://www.opengis.net/kml/2.2}coordinates"):
-            if coords_el.text:
-                poly = _parse_coordinates(coords_el.text.strip())
-                if poly is not None:
-                    polygons.append(poly)
+    # Fallback: decode with replacement, then re-parse
+    decoded = raw.decode("utf-8", errors="replace").encode("utf-8")
+    try:
+        for i, zone in enumerate(_iter_placemarks(decoded, filename_codcom, wanted)):
+            if i >= done:
+                yield zone
+    except etree.XMLSyntaxError as e:
+        logger.warning(f"Cannot parse KML {kml_name}: {e}")
+
+
+def _iter_placemarks(
+    raw: bytes, filename_codcom: str, wanted: dict[str, frozenset[str]] | None
+) -> Iterator[dict]:
+    """Stream Placemark elements out of raw with iterparse, clearing each after use."""
+    events = etree.iterparse(
+        io.BytesIO(raw), events=("end",), tag=_PLACEMARK_TAG, **_KML_PARSE_OPTIONS
+    )
+    for _, pm in events:
+        zone = _placemark_zone(pm, filename_codcom, wanted)
+        # Drop the element and the already-processed siblings before it
+        pm.clear()
+        while pm.getprevious() is not None:
+            del pm.getparent()[0]
+        if zone is not None:
+            yield zone
+
+
+def _placemark_zone(
+    pm: etree._Element, filename_codcom: str, wanted: dict[str, frozenset[str]] | None
+) -> dict | None:
+    """Return codcom, codzona, link_zona and geometry of one Placemark, or None."""
+    data = {}
+
+    # Extract ExtendedData fields
+    for data_el in _DATA(pm):
+        value = _VALUE_TEXT(data_el)
+        if value:
+            data[data_el.get("name", "")] = value[0].strip()
+
+    name = _NAME_TEXT(pm)
+    keys = _zone_keys(data, name[0] if name else None, filename_codcom)
+    if keys is None:
+        return None
+    codcom, codzona, link_zona = keys
+    if not _is_wanted(keys, wanted):
+        return {"codcom": codcom, "codzona": codzona, "link_zona": link_zona, "geometry": None}
+
+    # Parse all rings (may be inside MultiGeometry or direct)
+    rings = [r for r in map(_parse_coordinates, _COORDINATES_TEXT(pm)) if r is not None]
+    if not rings:
+        return None
+
+    return {
+        "codcom": codcom,
+        "codzona": codzona,
+        "link_zona": link_zona,
+        "geometry": _zone_geometry(rings),
+    }
+
+
+def _is_wanted(keys: tuple[str, str, str], wanted: dict[str, frozenset[str]] | None) -> bool:
+    """Whether the importer can resolve these keys, i.e. their geometry is worth building."""
+    codcom, codzona, link_zona = keys
+    if wanted is None or (link_zona and _LINK_ZONA_RE.fullmatch(link_zona)):
+        return True
+    return codzona in wanted.get(codcom, ())
+
+
+def _zone_keys(
+    data: dict[str, str], name: str | None, filename_codcom: str
+) -> tuple[str, str, str] | None:
+    """Return (codcom, codzona, link_zona) from a Placemark's ExtendedData and <name>."""
+    codcom = data.get("CODCOM", "")
+    codzona = data.get("CODZONA", "")
+    link_zona = data.get("LINKZONA", "")
+
+    # Three KML formats:
+    # 1. LINKZONA populated directly (2010, 2013)
+    # 2. CODCOM + CODZONA (2014_S2+)
+    # 3. Neither — extract codcom from filename, codzona from <name> tag (2014_S1)
+    if not codcom and not codzona and not link_zona:
+        # Try to extract zone code from <name>: "CITY - Zona OMI R1"
+        zone_match = _ZONE_NAME_RE.search(name) if name else None
+        if not zone_match:
+            return None
+        codcom = filename_codcom
+        codzona = zone_match.group(1)
 
-        if not polygons:
-            continue
+    return codcom, codzona, link_zona
 
-        geom = MultiPolygon(polygons)
 
-        zones.append({
-            "codcom": codcom,
-            "codzona": codzona,
-            "link_zona": link_zona,
-            "geometry": geom,
-        })
+def _parse_coordinates(coord_text: str) -> np.ndarray | None:
+    """Parse KML coordinate string into the points of one polygon ring.
 
-    return zones
+    Format: "lng,lat,alt lng,lat,alt ..."
+    Returns None when the points cannot form a ring (fewer than 3 distinct).
+    """
+    points = _coordinate_array(coord_text.strip())
+    closed = len(points) > 0 and np.array_equal(points[0], points[-1])
+    if len(points) < (4 if closed else 3):
+        return None
+    return points
 
 
-def _parse_coordinates(coord_text: str) -> Polygon | None:
-    """Parse KML coordinate string into a Shapely Polygon.
+def _zone_geometry(rings: list[np.ndarray]) -> Polygon | MultiPolygon:
+    """Build one shell-only polygon per ring, in vectorized calls.
 
-    Format: "lng,lat,alt lng,lat,alt ..."
+    A single ring (most zones) stays a Polygon; the insert's ST_Multi wraps it
+    server-side, so no client-side collection is built for it. Several rings become
+    a MultiPolygon: shapely.linearrings builds every ring from one coordinate array
+    and closes the open ones, instead of a Polygon constructor call per ring.
     """
+    if len(rings) == 1:
+        return shapely.polygons(rings[0])
+    ring_index = np.repeat(np.arange(len(rings)), [len(r) for r in rings])
+    polygons = shapely.polygons(shapely.linearrings(np.concatenate(rings), indices=ring_index))
+    return shapely.multipolygons(polygons)
+
+
+def _coordinate_array(coord_text: str) -> np.ndarray:
+    """Return the (lng, lat) pairs of a KML coordinate string as an Nx2 array.
+
+    Tuples in a KML share one arity (lng,lat or lng,lat,alt), so numpy parses the
+    whole string in one call and reshapes it. If the numbers and commas don't add
+    up to whole tuples (a malformed value), falls back to per-tuple parsing, which
+    skips the bad tuples.
+    """
+    first = coord_text.split(None, 1)
+    width = first[0].count(",") + 1 if first else 0
+    if width >= 2:
+        try:
+            flat = np.fromstring(coord_text.replace(",", " "), sep=" ")
+        except ValueError:  # numpy >= 2.3; older versions stop early and warn
+            flat = None
+        if flat is not None:
+            n = flat.size // width
+            if flat.size == n * width and coord_text.count(",") == n * (width - 1):
+                return flat.reshape(n, width)[:, :2]
+
     points = []
     for triplet in coord_text.split():
         parts = triplet.split(",")
         if len(parts) >= 2:
             try:
-                lng = float(parts[0])
-                lat = float(parts[1])
-                points.append((lng, lat))
+                points.append((float(parts[0]), float(parts[1])))
             except ValueError:
                 continue
-
-    if len(points) >= 3:
-        # Ensure ring is closed
-        if points[0] != points[-1]:
-            points.append(points[0])
-        try:
-            return Polygon(points)
-        except Exception:
-            return None
-    return None
+    return np.array(points, dtype=float).reshape(-1, 2)
 
 
 def import_kml_zones(
     kml_dir: str,
     semester: str,
     zone_lookup: dict,
-    db_url: str,
+    db: str | Engine,
 ) -> int:
     """Import all KML files from a directory into PostGIS.
 
+    Goes through the same COPY-into-staging path as import_kml_zones_batch rather
+    than one INSERT and commit per placemark.
+
     Args:
         kml_dir: Directory containing KML files.
         semester: Semester string, e.g. "2025_S1".
         zone_lookup: Dict from import_zone_descriptions: (belfiore_code, zone_code) -> row data.
-        db_url: PostgreSQL connection string.
+        db: PostgreSQL connection string or Engine.
 
     Returns:
         Number of zones imported.
     """
-    kml_files = sorted(Path(kml_dir).glob("*.kml"))
-    logger.info(f"Found {len(kml_files)} KML files in {kml_dir}")
+    return import_kml_zones_batch(kml_dir, semester, zone_lookup, db)
 
-    engine = create_engine(db_url)
-    total = 0
-    skipped_no_lookup = 0
 
+def iter_kml_dir(kml_dir: str) -> Iterator[tuple[str, bytes]]:
+    """Yield (file name, content) for every KML file in a directory."""
+    kml_files = sorted(Path(kml_dir).glob("*.kml"))
+    logger.info(f"Found {len(kml_files)} KML files in {kml_dir}")
     for kml_path in kml_files:
-        placemarks = parse_kml_placemarks(str(kml_path))
-        if not placemarks:
-            continue
+        yield kml_path.name, kml_path.read_bytes()
 
-        for pm in placemarks:
-            codcom = pm["codcom"]
-            codzona = pm["codzona"]
-            geom = pm["geometry"]
 
-            # Look up zone metadata from ZONE CSV
-            key = (codcom, codzona)
-            zone_info = zone_lookup.get(key)
+def iter_kml_zip(z: ZipFile) -> Iterator[tuple[str, bytes]]:
+    """Yield (member name, content) for every KML in an open zip, without extracting.
 
-            if zone_info is None:
-                skipped_no_lookup += 1
-                continue
+    Members are read by ZipInfo, so each read skips the by-name directory lookup.
+    """
+    infos = sorted(
+        (i for i in z.infolist() if not i.is_dir() and i.filename.lower().endswith(".kml")),
+        key=lambda i: i.filename,
+    )
+    for info in infos:
+        yield info.filename, z.read(info)
 
-            link_zona = zone_info["link_zona"]
-            if not link_zona or not re.match(r"^[A-Z]{2}\d{8}$", link_zona):
-                skipped_no_lookup += 1
-                continue
 
-            wkt_geom = geom.wkt
+def prefetch(items: Iterable, depth: int = KML_PREFETCH) -> Iterator:
+    """Iterate items on a background thread, running up to depth items ahead.
 
+    Wrapping iter_kml_zip(z) lets zlib decompress the next members while the caller
+    parses and COPYs the current one (both sides release the GIL for much of their
+    work). Exceptions from the producer are re-raised here, in order.
+    """
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                q.put((item, None))
+        except Exception as e:
+            q.put((done, e))
+        else:
+            q.put((done, None))
+
+    worker = threading.Thread(target=produce, name="kml-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, error = q.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # Consumer stopped early: unblock a producer waiting on the full queue
+        stop.set()
+        while worker.is_alive():
             try:
-                with engine.begin() as conn:
-                    conn.execute(
-                        text("""
-                            INSERT INTO omi.zones
-                                (link_zona, zone_code, fascia, municipality_istat,
-                                 municipality_name, province_code, zone_description,
-                                 semester, geom)
-                            VALUES
-                                (:link_zona, :zone_code, :fascia, :municipality_istat,
-                                 :municipality_name, :province_code, :zone_description,
-                                 :semester, ST_Multi(ST_CollectionExtract(ST_MakeValid(ST_GeomFromText(:wkt, 4326)), 3)))
-                            ON CONFLICT (link_zona, semester) DO NOTHING
-                        """),
-                        {
-                            "link_zona": link_zona,
-                            "zone_code": zone_info["zone_code"],
-                            "fascia": zone_info["fascia"],
-                            "municipality_istat": zone_info["municipality_istat"],
-                            "municipality_name": zone_info["municipality_name"],
-                            "province_code": zone_info["province_code"],
-                            "zone_description": zone_info["zone_description"],
-                            "semester": semester,
-                            "wkt": wkt_geom,
-                        },
-                    )
-                total += 1
-            except Exception as e:
-                if "duplicate" in str(e).lower():
-                    pass  # Already exists
-                else:
-                    logger.error(f"Error importing zone {link_zona} from {kml_path.name}: {e}")
+                q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        worker.join()
 
-    if skipped_no_lookup > 0:
-        logger.warning(
-            f"Skipped {skipped_no_lookup} KML placemarks with no matching ZONE CSV entry"
-        )
-    logger.info(f"Imported {total} zone polygons for {semester}")
-    return total
+
+def _parse_kml_member(
+    member: tuple[str, bytes], wanted: dict[str, frozenset[str]] | None = None
+) -> list[dict]:
+    """Parse one (name, content) pair, with each zone's geometry replaced by "wkb".
+
+    WKB is what the COPY sends, and it pickles cheaply back from a parse worker.
+    Zones outside wanted get None (see parse_kml_bytes).
+    """
+    name, raw = member
+    zones = list(parse_kml_bytes(raw, name, wanted))
+    for zone in zones:
+        geometry = zone.pop("geometry")
+        zone["wkb"] = geometry.wkb if geometry is not None else None
+    return zones
+
+
+def _parse_kml_member_gdal(
+    member: tuple[str, bytes], wanted: dict[str, frozenset[str]] | None = None
+) -> list[dict]:
+    """Parse one (name, content) pair like _parse_kml_member, with GDAL's LIBKML driver.
+
+    OGR parses the XML and builds each geometry in C, handing back WKB directly: no
+    lxml tree or shapely object is made. A file OGR cannot open (no LIBKML driver,
+    an encoding expat rejects) goes through the lxml path instead.
+    """
+    name, raw = member
+    path = f"/vsimem/{uuid.uuid4().hex}/{name}"
+    gdal.FileFromMemBuffer(path, raw)
+    try:
+        try:
+            ds = gdal.OpenEx(path, gdal.OF_VECTOR, allowed_drivers=["LIBKML"])
+        except RuntimeError:  # gdal.UseExceptions() in effect
+            ds = None
+        if ds is None:
+            logger.debug(f"OGR could not open {name}, parsing it with lxml")
+            return _parse_kml_member(member, wanted)
+
+        filename_codcom = Path(name).stem
+        zones = []
+        for layer in ds:
+            for feat in layer:
+                geom = feat.GetGeometryRef()
+                if geom is None or geom.IsEmpty():
+                    continue
+                # LIBKML exposes <name> as "Name" and each <Data> as a field of its name
+                data = {
+                    k.upper(): v.strip()
+                    for k, v in feat.items().items() if isinstance(v, str) and v.strip()
+                }
+                keys = _zone_keys(data, data.get("NAME"), filename_codcom)
+                if keys is None:
+                    continue
+                wkb = None
+                if _is_wanted(keys, wanted):
+                    # Altitudes are dropped, as the lxml path does
+                    geom.FlattenTo2D()
+                    wkb = bytes(geom.ExportToWkb())
+                codcom, codzona, link_zona = keys
+                zones.append({
+                    "codcom": codcom,
+                    "codzona": codzona,
+                    "link_zona": link_zona,
+                    "wkb": wkb,
+                })
+        return zones
+    finally:
+        gdal.Unlink(path)
+
+
+# The wanted keys of a parse worker, sent once through the pool initializer rather
+# than pickled with every file
+_worker_wanted: dict[str, frozenset[str]] | None = None
+
+
+def _init_parse_worker(wanted: dict[str, frozenset[str]] | None):
+    """Pool initializer: drop the inherited DB sockets and keep the wanted keys."""
+    global _worker_wanted
+    reset_after_fork()
+    _worker_wanted = wanted
+
+
+def _parse_in_worker(parse, member: tuple[str, bytes]) -> list[dict]:
+    """Run parse on one member in a pool worker, with the initializer's wanted keys."""
+    return parse(member, _worker_wanted)
+
+
+def _parse_kml_members(
+    kml_files: Iterable[tuple[str, bytes]],
+    workers: int,
+    use_gdal: bool = False,
+    wanted: dict[str, frozenset[str]] | None = None,
+) -> Iterator[list[dict]]:
+    """Yield each KML's zones in order, parsed in worker processes when workers > 1.
+
+    At most workers * KML_PARSE_BACKLOG files are in flight at a time.
+    """
+    parse = _parse_kml_member_gdal if use_gdal else _parse_kml_member
+    if workers <= 1:
+        for member in kml_files:
+            yield parse(member, wanted)
+        return
+    # The prefetch and writer threads are already running: forking this process could
+    # copy a lock one of them holds, so workers start from a clean forkserver instead
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=_init_parse_worker,
+        initargs=(wanted,),
+    ) as pool:
+        in_flight = deque()
+        for member in kml_files:
+            in_flight.append(pool.submit(_parse_in_worker, parse, member))
+            if len(in_flight) >= workers * KML_PARSE_BACKLOG:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
 
 
 def import_kml_zones_batch(
-    kml_dir: str,
+    kml_source: str | Iterable[tuple[str, bytes]],
     semester: str,
     zone_lookup: dict,
-    db_url: str,
-    batch_size: int = 500,
+    db: str | Engine,
+    batch_size: int = ZONE_BATCH_SIZE,
+    parse_workers: int = 1,
+    use_gdal: bool = False,
 ) -> int:
     """Batch version of KML import for better performance.
 
     Collects zones into batches and inserts them in bulk.
+
+    Args:
+        kml_source: Directory of KML files, or an iterable of (name, content) pairs
+            such as iter_kml_zip(zipfile) to read straight from an OMI archive.
+        parse_workers: Processes parsing KMLs (CPU-bound lxml/shapely work) while this
+            one does the lookups and COPYs. 1 parses in this process.
+        use_gdal: Parse with GDAL's LIBKML driver (the gdal extra) instead of lxml and
+            shapely; ring handling differs (inner boundaries become holes).
     """
-    kml_files = sorted(Path(kml_dir).glob("*.kml"))
-    logger.info(f"Found {len(kml_files)} KML files in {kml_dir}")
+    if use_gdal and ogr is None:
+        raise RuntimeError("use_gdal needs the GDAL Python bindings (the gdal extra)")
+    kml_files = iter_kml_dir(kml_source) if isinstance(kml_source, str) else kml_source
 
-    engine = create_engine(db_url)
-    total = 0
+    engine = as_engine(db)
     skipped = 0
     batch = []
 
+    # Validate the lookup's LinkZona codes once here rather than once per placemark;
+    # a placemark whose key is dropped is skipped like one with no ZONE CSV entry
+    zone_lookup = {
+        k: v for k, v in zone_lookup.items() if _LINK_ZONA_RE.fullmatch(v.get("link_zona") or "")
+    }
+
     # Build reverse index: link_zona -> zone_info (for older KMLs with direct LINKZONA)
-    lz_reverse = {v["link_zona"]: v for v in zone_lookup.values() if v.get("link_zona")}
+    lz_reverse = {v["link_zona"]: v for v in zone_lookup.values()}
+
+    # Nested by municipality: the placemarks of a KML share one codcom, so each probe
+    # is a codzona lookup in that municipality's small dict, with no key tuple built
+    by_com: dict[str, dict[str, dict]] = {}
+    for (codcom, codzona), info in zone_lookup.items():
+        by_com.setdefault(codcom, {})[codzona] = info
+    last_com, com_zones = None, {}
+    # Sent to the parser, which then skips the geometry of placemarks with no entry
+    wanted = {codcom: frozenset(zones) for codcom, zones in by_com.items()}
+
+    # Zones already stored for the semester (a resumed import) or seen earlier in this
+    # run are dropped here; ON CONFLICT would keep the first one too, but only after
+    # the row was COPYed and probed against the unique index
+    with engine.connect() as conn:
+        seen = set(conn.execute(
+            text("SELECT link_zona FROM omi.zones WHERE semester = :sem"), {"sem": semester}
+        ).scalars())
+    duplicates = 0
+
+    # COPYs run on a writer thread, so parsing the next files overlaps each round trip
+    writer = _BatchWriter(engine)
+    try:
+        for placemarks in _parse_kml_members(kml_files, parse_workers, use_gdal, wanted):
+            for pm in placemarks:
+                # Older KMLs have LINKZONA directly; newer ones need lookup via CODCOM+CODZONA
+                direct_lz = pm.get("link_zona", "")
+                if direct_lz and _LINK_ZONA_RE.fullmatch(direct_lz):
+                    link_zona = direct_lz
+                    zone_info = lz_reverse.get(direct_lz, {
+                        "zone_code": "",
+                        "fascia": "",
+                        "municipality_istat": "",
+                        "municipality_name": "",
+                        "province_code": "",
+                        "zone_description": "",
+                    })
+                else:
+                    if pm["codcom"] != last_com:
+                        last_com = pm["codcom"]
+                        com_zones = by_com.get(last_com, {})
+                    zone_info = com_zones.get(pm["codzona"])
 
-    for kml_path in kml_files:
-        placemarks = parse_kml_placemarks(str(kml_path))
-        for pm in placemarks:
-            # Older KMLs have LINKZONA directly; newer ones need lookup via CODCOM+CODZONA
-            direct_lz = pm.get("link_zona", "")
-            if direct_lz and re.match(r"^[A-Z]{2}\d{8}$", direct_lz):
-                link_zona = direct_lz
-                zone_info = lz_reverse.get(direct_lz, {
-                    "zone_code": "",
-                    "fascia": "",
-                    "municipality_istat": "",
-                    "municipality_name": "",
-                    "province_code": "",
-                    "zone_description": "",
-                })
-            else:
-                key = (pm["codcom"], pm["codzona"])
-                zone_info = zone_lookup.get(key)
+                    if zone_info is None:
+                        skipped += 1
+                        continue
 
-                if zone_info is None:
-                    skipped += 1
-                    continue
+                    link_zona = zone_info["link_zona"]
 
-                link_zona = zone_info["link_zona"]
-                if not link_zona or not re.match(r"^[A-Z]{2}\d{8}$", link_zona):
-                    skipped += 1
+                if link_zona in seen:
+                    duplicates += 1
                     continue
+                seen.add(link_zona)
+
+                batch.append({
+                    "link_zona": link_zona,
+                    "zone_code": zone_info.get("zone_code", ""),
+                    "fascia": zone_info.get("fascia", ""),
+                    "municipality_istat": zone_info.get("municipality_istat", ""),
+                    "municipality_name": zone_info.get("municipality_name", ""),
+                    "province_code": zone_info.get("province_code", ""),
+                    "zone_description": zone_info.get("zone_description", ""),
+                    "semester": semester,
+                    "wkb": pm["wkb"],
+                })
 
-            batch.append({
-                "link_zona": link_zona,
-                "zone_code": zone_info.get("zone_code", ""),
-                "fascia": zone_info.get("fascia", ""),
-                "municipality_istat": zone_info.get("municipality_istat", ""),
-                "municipality_name": zone_info.get("municipality_name", ""),
-                "province_code": zone_info.get("province_code", ""),
-                "zone_description": zone_info.get("zone_description", ""),
-                "semester": semester,
-                "wkt": pm["geometry"].wkt,
-            })
-
-            if len(batch) >= batch_size:
-                total += _insert_batch(engine, batch)
-                batch = []
-
-    # Flush remaining
-    if batch:
-        total += _insert_batch(engine, batch)
+                if len(batch) >= batch_size:
+                    writer.put(batch)
+                    batch = []
+
+        # Flush remaining
+        if batch:
+            writer.put(batch)
+    finally:
+        writer.close()
+    total = writer.result()
 
     if skipped > 0:
         logger.warning(f"Skipped {skipped} KML placemarks with no matching ZONE CSV entry")
+    if duplicates > 0:
+        logger.info(f"Skipped {duplicates} placemarks already imported for {semester}")
     logger.info(f"Imported {total} zone polygons for {semester}")
     return total
 
 
+class _BatchWriter:
+    """Run _insert_batch on a background thread for each batch given to put().
+
+    At most ZONE_WRITE_BACKLOG batches wait in the queue, after which put() blocks.
+    psycopg releases the GIL while COPY data travels, so the caller keeps parsing.
+    The first error stops the writing; put() and result() re-raise it.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.total = 0
+        self.error: Exception | None = None
+        self._queue: queue.Queue = queue.Queue(maxsize=ZONE_WRITE_BACKLOG)
+        self._thread = threading.Thread(target=self._run, name="zone-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while (batch := self._queue.get()) is not None:
+            # After an error, keep draining so put() never blocks on a full queue
+            if self.error is None:
+                try:
+                    self.total += _insert_batch(self.engine, batch)
+                except Exception as e:
+                    self.error = e
+
+    def put(self, batch: list[dict]):
+        if self.error is not None:
+            raise self.error
+        self._queue.put(batch)
+
+    def close(self):
+        """Wait for the queued batches to be written and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def result(self) -> int:
+        """Rows inserted by all batches; call after close()."""
+        if self.error is not None:
+            raise self.error
+        return self.total
+
+
+_ZONE_COLUMNS = (
+    "link_zona", "zone_code", "fascia", "municipality_istat",
+    "municipality_name", "province_code", "zone_description", "semester",
+)
+
+_STAGE_TYPES = ["text"] * len(_ZONE_COLUMNS) + ["bytea"]
+
+_CREATE_STAGE = """
+    CREATE TEMP TABLE zones_stage (
+        link_zona TEXT, zone_code TEXT, fascia TEXT, municipality_istat TEXT,
+        municipality_name TEXT, province_code TEXT, zone_description TEXT,
+        semester TEXT, wkb BYTEA
+    ) ON COMMIT DROP
+"""
+
+
 def _insert_batch(engine, batch: list[dict]) -> int:
-    """Insert a batch of zone records using SAVEPOINTs for error isolation."""
-    inserted = 0
-    with engine.begin() as conn:
-        for row in batch:
-            try:
-                conn.execute(text("SAVEPOINT sp"))
-                result = conn.execute(
-                    text("""
-                        INSERT INTO omi.zones
-                            (link_zona, zone_code, fascia, municipality_istat,
-                             municipality_name, province_code, zone_description,
-                             semester, geom)
-                        VALUES
-                            (:link_zona, :zone_code, :fascia, :municipality_istat,
-                             :municipality_name, :province_code, :zone_description,
-                             :semester, ST_Multi(ST_CollectionExtract(ST_MakeValid(ST_GeomFromText(:wkt, 4326)), 3)))
-                        ON CONFLICT (link_zona, semester) DO NOTHING
-                    """),
-                    row,
-                )
-                conn.execute(text("RELEASE SAVEPOINT sp"))
-                if result.rowcount > 0:
-                    inserted += 1
-            except Exception as e:
-                conn.execute(text("ROLLBACK TO SAVEPOINT sp"))
-                logger.error(f"Error inserting zone {row['link_zona']}: {e}")
-    return inserted
+    """COPY a batch of zone records into a staging table, then merge into omi.zones.
+
+    Geometries travel as WKB and are repaired server-side in one INSERT ... SELECT.
+    If anything in the batch fails, each half is retried the same way, so one bad
+    polygon costs about 2*log2(len(batch)) small COPYs and only that row is lost.
+    """
+    cols = ", ".join(_ZONE_COLUMNS)
+    raw_conn = engine.raw_connection()
+    try:
+        cursor = raw_conn.cursor()
+        # Every batch commits; a replayable import need not wait for each WAL flush
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        cursor.execute(_CREATE_STAGE)
+        # Binary COPY sends the WKB as raw bytes; text format would hex-escape every
+        # byte, quadrupling the payload and costing ~50x more client CPU to format
+        with cursor.copy(f"COPY zones_stage ({cols}, wkb) FROM STDIN (FORMAT BINARY)") as copy:
+            copy.set_types(_STAGE_TYPES)
+            for row in batch:
+                copy.write_row([row[c] for c in _ZONE_COLUMNS] + [row["wkb"]])
+        cursor.execute(f"""
+            INSERT INTO omi.zones ({cols}, geom)
+            SELECT {cols},
+                   ST_Multi(ST_CollectionExtract(ST_MakeValid(ST_GeomFromWKB(wkb, 4326)), 3))
+            FROM zones_stage
+            ON CONFLICT (link_zona, semester) DO NOTHING
+        """)
+        inserted = cursor.rowcount
+        raw_conn.commit()
+        return inserted
+    except Exception as e:
+        raw_conn.rollback()
+        if len(batch) == 1:
+            logger.error(f"Error inserting zone {batch[0]['link_zona']}: {e}")
+            return 0
+        logger.warning(f"COPY of {len(batch)} zones failed, retrying in halves: {e}")
+    finally:
+        raw_conn.close()
+
+    mid = len(batch) // 2
+    return _insert_batch(engine, batch[:mid]) + _insert_batch(engine, batch[mid:])
@@ -2,10 +2,11 @@
 -- Requires PostgreSQL with PostGIS extension
 
 CREATE EXTENSION IF NOT EXISTS postgis;
+CREATE EXTENSION IF NOT EXISTS btree_gist;               -- scalar columns in GiST indexes
 CREATE SCHEMA IF NOT EXISTS omi;
 
 -- OMI zone polygons (one row per zone per semester)
-CREATE TABLE omi.zones (
+CREATE TABLE IF NOT EXISTS omi.zones (
     id                  SERIAL PRIMARY KEY,
     link_zona           VARCHAR(12) NOT NULL,   -- e.g. "AG00000027" — JOIN KEY
     zone_code           VARCHAR(10) NOT NULL,   -- e.g. "B01"
@@ -18,12 +19,13 @@ CREATE TABLE omi.zones (
     geom                GEOMETRY(MultiPolygon, 4326) NOT NULL,
     UNIQUE(link_zona, semester)
 );
-CREATE INDEX idx_zones_geom ON omi.zones USING GIST (geom);
-CREATE INDEX idx_zones_link ON omi.zones (link_zona);
-CREATE INDEX idx_zones_semester ON omi.zones (semester);
+-- idx_zones_sem_geom (GiST on semester, geom) is built CONCURRENTLY by the importer
+-- (CONCURRENT_INDEXES in scripts/import_omi.py), outside this transaction
+CREATE INDEX IF NOT EXISTS idx_zones_link ON omi.zones (link_zona);
+CREATE INDEX IF NOT EXISTS idx_zones_semester ON omi.zones (semester);
 
 -- OMI quotations (multiple rows per zone: one per property type × conservation state × semester)
-CREATE TABLE omi.quotations (
+CREATE TABLE IF NOT EXISTS omi.quotations (
     id                  SERIAL PRIMARY KEY,
     link_zona           VARCHAR(12) NOT NULL,
     semester            VARCHAR(7) NOT NULL,
@@ -39,11 +41,27 @@ CREATE TABLE omi.quotations (
     surface_type_rent   CHAR(1),
     UNIQUE(link_zona, semester, property_type_code, conservation_state)
 );
-CREATE INDEX idx_quot_lookup ON omi.quotations (link_zona, semester);
-CREATE INDEX idx_quot_type ON omi.quotations (property_type_code);
+-- idx_quot_covering is built CONCURRENTLY by the importer, like idx_zones_sem_geom
+CREATE INDEX IF NOT EXISTS idx_quot_type ON omi.quotations (property_type_code);
+
+-- Prevalent "Abitazioni civili" (type 20) price per zone, used to color the map layers.
+-- Replaces a per-zone LATERAL subquery; refreshed by the importer after each run.
+CREATE MATERIALIZED VIEW IF NOT EXISTS omi.zone_prevalent_20 AS
+    SELECT DISTINCT ON (link_zona, semester)
+           link_zona, semester, price_min, price_max
+    FROM omi.quotations
+    WHERE property_type_code = 20 AND is_prevalent
+    ORDER BY link_zona, semester, conservation_state;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_zone_prevalent_20 ON omi.zone_prevalent_20 (link_zona, semester);
+
+-- Semesters with zone polygons. DISTINCT over omi.zones reads the whole semester
+-- index; this holds one row per semester. Refreshed by the importer with the view above.
+CREATE MATERIALIZED VIEW IF NOT EXISTS omi.zone_semesters AS
+    SELECT DISTINCT semester FROM omi.zones;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_zone_semesters ON omi.zone_semesters (semester);
 
 -- Manually entered transaction data (from the Agenzia's "Consultazione Valori Immobiliari Dichiarati")
-CREATE TABLE omi.transactions (
+CREATE TABLE IF NOT EXISTS omi.transactions (
     id                  SERIAL PRIMARY KEY,
     transaction_date    DATE,                   -- month/year of the deed
     transaction_type    VARCHAR(30),            -- Residenziale, Commerciale, Produttivo, etc.
@@ -60,7 +78,7 @@ CREATE TABLE omi.transactions (
 );
 
 -- Geocoding cache
-CREATE TABLE omi.geocode_cache (
+CREATE TABLE IF NOT EXISTS omi.geocode_cache (
     address             TEXT PRIMARY KEY,
     lat                 DOUBLE PRECISION,
     lng                 DOUBLE PRECISION,
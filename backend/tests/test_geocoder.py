@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from app.services.geocoder import GeoResult, ItalianGeocoder
+
+
+@pytest.mark.asyncio
+async def test_cancelled_owner_does_not_cancel_waiters():
+    geocoder = ItalianGeocoder()
+    calls = 0
+
+    async def fake_uncached(address, key, db):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return GeoResult(45.46, 9.19, "nominatim")
+
+    geocoder._geocode_uncached = fake_uncached
+
+    owner = asyncio.create_task(geocoder.geocode("Via Roma 10, Milano", None))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(geocoder.geocode("via roma 10 milano", None))
+    await asyncio.sleep(0)
+
+    owner.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await owner
+
+    # The waiter takes the lookup over instead of inheriting the owner's cancellation
+    assert await waiter == GeoResult(45.46, 9.19, "nominatim")
+    assert calls == 2
+    assert not geocoder._inflight